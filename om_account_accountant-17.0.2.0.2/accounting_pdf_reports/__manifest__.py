@@ -14,15 +14,18 @@
     'maintainer': 'Odoo Mates',
     'support': 'odoomates@gmail.com',
     'website': 'https://www.youtube.com/watch?v=yA4NLwOLZms',
-    'depends': ['account'],
+    'depends': ['account', 'om_account_currency'],
     'live_test_url': 'https://www.youtube.com/watch?v=yA4NLwOLZms',
     'data': [
         'security/ir.model.access.csv',
+        'security/account_report_job_security.xml',
         'data/account_account_type.xml',
+        'data/account_report_job_data.xml',
         'views/menu.xml',
         'views/ledger_menu.xml',
         'views/financial_report.xml',
         'views/settings.xml',
+        'views/account_report_job_views.xml',
         'wizard/account_report_common_view.xml',
         'wizard/partner_ledger.xml',
         'wizard/general_ledger.xml',
@@ -1,3 +1,14 @@
 from . import account_account_type
 from . import account_financial_report
+from . import account_tax
 from . import account_move_line
+from . import account_move
+from . import account_balance_snapshot
+from . import res_currency
+from . import account_report_job
+from . import account_report_export
+from . import ir_actions_report
+from . import account_journal
+from . import account_payment_method_line
+from . import account_report_ledger
+from . import base
@@ -0,0 +1,220 @@
+from odoo import api, fields, models
+from odoo.osv import expression
+from odoo.tools.safe_eval import safe_eval
+
+# context keys of _query_get that cannot be answered from the snapshots
+SNAPSHOT_UNSUPPORTED_KEYS = [
+    'aged_balance', 'reconcile_date', 'account_tag_ids', 'analytic_tag_ids',
+    'analytic_account_ids', 'partner_ids', 'partner_categories',
+]
+
+
+class AccountBalanceSnapshot(models.Model):
+    _name = "account.balance.snapshot"
+    _description = "Account Balance Snapshot"
+    _order = 'date, account_id'
+
+    company_id = fields.Many2one('res.company', 'Company', required=True, readonly=True, ondelete='cascade')
+    account_id = fields.Many2one('account.account', 'Account', required=True, readonly=True, ondelete='cascade')
+    journal_id = fields.Many2one('account.journal', 'Journal', required=True, readonly=True, ondelete='cascade')
+    date = fields.Date('Date', required=True, readonly=True)
+    company_currency_id = fields.Many2one(related='company_id.currency_id')
+    # numeric columns: the incremental updates must not drift from the journal items
+    debit = fields.Monetary('Debit', currency_field='company_currency_id', readonly=True)
+    credit = fields.Monetary('Credit', currency_field='company_currency_id', readonly=True)
+    # the snapshot is removed with the last journal item it aggregates
+    line_count = fields.Integer('Journal Items', readonly=True)
+
+    _sql_constraints = [('snapshot_uniq', 'unique(company_id, account_id, journal_id, date)',
+                         'Only one snapshot per company, account, journal and date is allowed')]
+
+    def init(self):
+        # a full rebuild scans all the journal items: only fill the table on
+        # install (or when the snapshots lack their line count), they are
+        # then kept up to date with the posted journal items
+        self._cr.execute("""SELECT NOT EXISTS(SELECT 1 FROM account_balance_snapshot)
+                                   OR EXISTS(SELECT 1 FROM account_balance_snapshot WHERE line_count IS NULL)""")
+        if self._cr.fetchone()[0]:
+            self._rebuild()
+
+    @api.model
+    def _rebuild(self):
+        """ Recomputes all the snapshots from the posted journal items """
+        self.env['account.move.line'].flush_model()
+        self._cr.execute("DELETE FROM account_balance_snapshot")
+        self._cr.execute("""
+            INSERT INTO account_balance_snapshot (company_id, account_id, journal_id, date, debit, credit, line_count)
+            SELECT l.company_id, l.account_id, l.journal_id, l.date,
+                   COALESCE(SUM(l.debit), 0), COALESCE(SUM(l.credit), 0), COUNT(*)
+            FROM account_move_line l
+            WHERE l.parent_state = 'posted' AND l.account_id IS NOT NULL
+            GROUP BY l.company_id, l.account_id, l.journal_id, l.date""")
+        self.invalidate_model()
+
+    @api.model
+    def _update_from_move_lines(self, line_ids, sign=1):
+        """ Adds (or removes, with sign=-1) the amounts of the given posted
+            journal items to the snapshots. The snapshots left without journal
+            items are removed, as the journal items would give no row for them.
+        """
+        if not line_ids:
+            return
+        self.env['account.move.line'].flush_model()
+        self._cr.execute("""
+            INSERT INTO account_balance_snapshot (company_id, account_id, journal_id, date, debit, credit, line_count)
+            SELECT l.company_id, l.account_id, l.journal_id, l.date,
+                   %s * COALESCE(SUM(l.debit), 0), %s * COALESCE(SUM(l.credit), 0), %s * COUNT(*)
+            FROM account_move_line l
+            WHERE l.id IN %s AND l.account_id IS NOT NULL
+            GROUP BY l.company_id, l.account_id, l.journal_id, l.date
+            ON CONFLICT (company_id, account_id, journal_id, date) DO UPDATE
+            SET debit = account_balance_snapshot.debit + EXCLUDED.debit,
+                credit = account_balance_snapshot.credit + EXCLUDED.credit,
+                line_count = account_balance_snapshot.line_count + EXCLUDED.line_count
+            RETURNING id, line_count""",
+                         (sign, sign, sign, tuple(line_ids)))
+        empty_ids = [snapshot_id for snapshot_id, line_count in self._cr.fetchall() if line_count <= 0]
+        if empty_ids:
+            self._cr.execute("DELETE FROM account_balance_snapshot WHERE id IN %s", (tuple(empty_ids),))
+        self.invalidate_model()
+
+    @api.model
+    def _has_restricting_rules(self):
+        """ Returns whether record rules, other than the multi-company one,
+            restrict the journal items the user reads: ``_query_get`` applies
+            them, the snapshots cannot.
+        """
+        if self.env.su:
+            return False
+        IrRule = self.env['ir.rule']
+        company_rule = self.env.ref('account.account_move_line_comp_rule', raise_if_not_found=False)
+        rules = IrRule._get_rules('account.move.line') - (company_rule or IrRule)
+        if not rules:
+            return False
+        eval_context = IrRule._eval_context()
+
+        def is_unrestricted(rule):
+            domain = safe_eval(rule.domain_force, eval_context) if rule.domain_force else []
+            return [tuple(leaf) if isinstance(leaf, list) else leaf
+                    for leaf in expression.normalize_domain(domain)] == expression.TRUE_DOMAIN
+
+        global_rules = rules.filtered(lambda rule: not rule.groups)
+        group_rules = rules - global_rules
+        if not all(is_unrestricted(rule) for rule in global_rules):
+            return True
+        # the group rules are combined with OR
+        return bool(group_rules) and not any(is_unrestricted(rule) for rule in group_rules)
+
+    @api.model
+    def _compute_account_balances(self, account_ids):
+        """ Returns a dictionary {account_id: {'debit', 'credit', 'balance'}}
+            of the journal items selected by the report context: from the
+            snapshots when the context allows it, from the journal items
+            otherwise.
+        """
+        balances = self._get_account_balances(account_ids)
+        if balances is None:
+            balances = self._get_move_line_balances(account_ids)
+        return balances
+
+    @api.model
+    def _get_move_line_balances(self, account_ids):
+        """ Same as :meth:`_get_account_balances`, aggregating the journal
+            items selected by ``account.move.line._query_get()``.
+        """
+        if not account_ids:
+            return {}
+        tables, where_clause, where_params = self.env['account.move.line']._query_get()
+        wheres = ['"account_move_line".account_id IN %s']
+        if where_clause.strip():
+            wheres.append(where_clause.strip())
+        request = """SELECT "account_move_line".account_id AS id,
+                   COALESCE(SUM("account_move_line".debit), 0) AS debit,
+                   COALESCE(SUM("account_move_line".credit), 0) AS credit
+            FROM """ + (tables or '"account_move_line"') + """
+            WHERE """ + " AND ".join(wheres) + """
+            GROUP BY "account_move_line".account_id"""
+        self._cr.execute(request, (tuple(account_ids),) + tuple(where_params))
+        res = {}
+        for row in self._cr.dictfetchall():
+            res[row.pop('id')] = dict(row, balance=row['debit'] - row['credit'])
+        return res
+
+    @api.model
+    def _get_account_balances(self, account_ids):
+        """ Query planner for the account balances of the report context.
+
+            Returns a dictionary {account_id: {'debit', 'credit', 'balance'}}
+            equivalent to aggregating the journal items selected by
+            ``account.move.line._query_get()``, or None when the context
+            filters on something the snapshots do not hold, or when record
+            rules restrict the journal items of the user. Posted entries
+            are read from the snapshots, only draft ones (when all entries
+            are targeted) are scanned from the journal items.
+        """
+        context = self.env.context
+        if not account_ids or any(context.get(key) for key in SNAPSHOT_UNSUPPORTED_KEYS):
+            return None
+        state = (context.get('state') or 'all').lower()
+        if state not in ('all', 'posted') or self._has_restricting_rules():
+            return None
+        self.env['account.move.line'].check_access_rights('read')
+
+        wheres = ["s.account_id IN %s"]
+        params = [tuple(account_ids)]
+        if context.get('date_to'):
+            wheres.append("s.date <= %s")
+            params.append(context['date_to'])
+        if context.get('date_from'):
+            if not context.get('strict_range'):
+                wheres.append("(s.date >= %s OR acc.include_initial_balance)")
+            elif context.get('initial_bal'):
+                wheres.append("s.date < %s")
+            else:
+                wheres.append("s.date >= %s")
+            params.append(context['date_from'])
+        if context.get('journal_ids'):
+            wheres.append("s.journal_id IN %s")
+            params.append(tuple(context['journal_ids']))
+        if context.get('company_id'):
+            company_ids = [context['company_id']]
+        elif context.get('allowed_company_ids'):
+            company_ids = self.env.companies.ids
+        else:
+            company_ids = [self.env.company.id]
+        # same restriction as the multi-company record rule of the journal items
+        company_ids = [x for x in company_ids if x in self.env.companies.ids]
+        if not company_ids:
+            return {}
+        wheres.append("s.company_id IN %s")
+        params.append(tuple(company_ids))
+        if context.get('account_ids'):
+            wheres.append("s.account_id IN %s")
+            params.append(tuple(context['account_ids'].ids))
+
+        request = """SELECT s.account_id AS id, COALESCE(SUM(s.debit), 0) AS debit, COALESCE(SUM(s.credit), 0) AS credit
+            FROM account_balance_snapshot s
+            JOIN account_account acc ON (s.account_id = acc.id)
+            WHERE """ + " AND ".join(wheres) + """
+            GROUP BY s.account_id"""
+        if state == 'all':
+            # the open edge: draft entries are not materialized
+            tables, where_clause, where_params = self.env['account.move.line'].with_context(state='draft')._query_get()
+            request += """ UNION ALL
+            SELECT "account_move_line".account_id AS id,
+                   COALESCE(SUM("account_move_line".debit), 0) AS debit,
+                   COALESCE(SUM("account_move_line".credit), 0) AS credit
+            FROM """ + tables + """
+            WHERE "account_move_line".account_id IN %s AND """ + where_clause + """
+            GROUP BY "account_move_line".account_id"""
+            params += [tuple(account_ids)] + where_params
+        self._cr.execute(request, tuple(params))
+
+        res = {}
+        for row in self._cr.dictfetchall():
+            values = res.setdefault(row['id'], {'debit': 0.0, 'credit': 0.0})
+            values['debit'] += row['debit']
+            values['credit'] += row['credit']
+        for values in res.values():
+            values['balance'] = values['debit'] - values['credit']
+        return res
@@ -1,4 +1,4 @@
-from odoo import api, models, fields
+from odoo import api, models, fields, tools
 
 
 class AccountFinancialReport(models.Model):
@@ -15,13 +15,50 @@ class AccountFinancialReport(models.Model):
                 level = report.parent_id.level + 1
             report.level = level
 
+    @api.model
+    @tools.ormcache()
+    def _get_hierarchy(self):
+        """ Returns the whole tree of reports loaded in one query, as a tuple
+            ({parent_id: (child_id, ...)}, {report_id: rank}) where children
+            and ranks follow the sequence order. The cache is cleared when
+            the tree changes.
+        """
+        self.flush_model(['parent_id', 'sequence'])
+        self.env.cr.execute("SELECT id, parent_id FROM account_financial_report ORDER BY sequence, id")
+        children = {}
+        rank = {}
+        for report_id, parent_id in self.env.cr.fetchall():
+            rank[report_id] = len(rank)
+            children.setdefault(parent_id, []).append(report_id)
+        return dict((parent_id, tuple(ids)) for parent_id, ids in children.items()), rank
+
     def _get_children_by_order(self):
-        res = self
-        children = self.search([('parent_id', 'in', self.ids)], order='sequence ASC')
-        if children:
-            for child in children:
-                res += child._get_children_by_order()
-        return res
+        children, rank = self._get_hierarchy()
+
+        def get_descendants(parent_ids):
+            res = []
+            child_ids = sorted((child_id for parent_id in parent_ids for child_id in children.get(parent_id, ())),
+                               key=rank.get)
+            for child_id in child_ids:
+                res.append(child_id)
+                res += get_descendants([child_id])
+            return res
+
+        return self.browse(list(self.ids) + get_descendants(self.ids))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        self.env.registry.clear_cache()
+        return super(AccountFinancialReport, self).create(vals_list)
+
+    def write(self, vals):
+        if 'parent_id' in vals or 'sequence' in vals:
+            self.env.registry.clear_cache()
+        return super(AccountFinancialReport, self).write(vals)
+
+    def unlink(self):
+        self.env.registry.clear_cache()
+        return super(AccountFinancialReport, self).unlink()
 
     name = fields.Char('Report Name', required=True, translate=True)
     parent_id = fields.Many2one('account.financial.report', 'Parent')
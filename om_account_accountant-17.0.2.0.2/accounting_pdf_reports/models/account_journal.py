@@ -0,0 +1,44 @@
+from odoo import api, models, tools
+
+
+class AccountJournal(models.Model):
+    _inherit = "account.journal"
+
+    @api.model
+    @tools.ormcache('journal_type', 'company_id')
+    def _get_payment_account_ids(self, journal_type, company_id):
+        """ Returns the ids of the accounts of the inbound and outbound payment
+            methods of the journals of ``journal_type`` ('cash' or 'bank') of
+            the company. The result is cached and cleared when the journals or
+            their payment methods change.
+        """
+        lines = self.env['account.payment.method.line'].sudo().search([
+            ('journal_id.type', '=', journal_type),
+            ('journal_id.company_id', '=', company_id),
+            ('payment_account_id', '!=', False),
+        ])
+        return tuple(sorted(set(lines.payment_account_id.ids)))
+
+    @api.model
+    def _get_payment_accounts(self, journal_type):
+        """ Returns the payment accounts of the cash or bank journals of the
+            allowed companies.
+        """
+        account_ids = set()
+        for company in self.env.companies:
+            account_ids.update(self._get_payment_account_ids(journal_type, company.id))
+        return self.env['account.account'].search([('id', 'in', list(account_ids))])
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        self.env.registry.clear_cache()
+        return super(AccountJournal, self).create(vals_list)
+
+    def write(self, vals):
+        if 'type' in vals or 'company_id' in vals or 'active' in vals:
+            self.env.registry.clear_cache()
+        return super(AccountJournal, self).write(vals)
+
+    def unlink(self):
+        self.env.registry.clear_cache()
+        return super(AccountJournal, self).unlink()
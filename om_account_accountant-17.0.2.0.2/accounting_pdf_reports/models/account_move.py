@@ -0,0 +1,17 @@
+from odoo import models
+
+
+class AccountMove(models.Model):
+    _inherit = "account.move"
+
+    def write(self, vals):
+        if 'state' not in vals:
+            return super(AccountMove, self).write(vals)
+        # the journal items of the posted entries are removed from the
+        # snapshots before the change and added back after it, whatever
+        # happens to them in between
+        Snapshot = self.env['account.balance.snapshot'].sudo()
+        Snapshot._update_from_move_lines(self.filtered(lambda move: move.state == 'posted').line_ids.ids, sign=-1)
+        res = super(AccountMove, self.with_context(skip_balance_snapshot=True)).write(vals)
+        Snapshot._update_from_move_lines(self.filtered(lambda move: move.state == 'posted').line_ids.ids)
+        return res
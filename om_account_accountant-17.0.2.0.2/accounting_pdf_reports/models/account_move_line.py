@@ -1,18 +1,108 @@
 import ast
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
 from odoo import api, models, fields
 
+# journal item fields aggregated in the balance snapshots
+SNAPSHOT_FIELDS = ['debit', 'credit', 'balance', 'account_id', 'journal_id', 'date', 'company_id']
+
+# context keys read by _query_get, the compiled filters are cached on them
+QUERY_GET_CONTEXT_KEYS = [
+    'aged_balance', 'date_from', 'date_to', 'strict_range', 'initial_bal',
+    'journal_ids', 'state', 'company_id', 'reconcile_date', 'account_tag_ids',
+    'account_ids', 'analytic_tag_ids', 'analytic_account_ids', 'partner_ids',
+    'partner_categories',
+]
+
+
+class MoveLineFilter(namedtuple('MoveLineFilter', ['tables', 'where_clause', 'where_params'])):
+    """ Compiled filter of the journal items, as returned by ``_query_get``.
+        It unpacks as the (tables, where clause, params) triple.
+    """
+    __slots__ = ()
+
+    def aliased(self, line_alias='l', move_alias='m'):
+        """ Returns the where clause as an ``AND ...`` fragment aliased on the
+            journal items and journal entries tables of the report query,
+            with its parameters.
+        """
+        where_clause = self.where_clause.strip()
+        if not where_clause:
+            return "", list(self.where_params)
+        where_clause = where_clause.replace('account_move_line__move_id', move_alias).replace('account_move_line', line_alias)
+        return " AND " + where_clause, list(self.where_params)
+
 
 class AccountMoveLine(models.Model):
     _inherit = "account.move.line"
 
+    def _get_query_get_key(self, domain):
+        """ Normalizes the report context, the domain and the rule set of the
+            user into a hashable key.
+        """
+        context = self._context
+        values = []
+        for key in QUERY_GET_CONTEXT_KEYS:
+            value = context.get(key)
+            if isinstance(value, models.BaseModel):
+                value = (value._name, tuple(sorted(value.ids)))
+            elif isinstance(value, (list, tuple, set)):
+                value = tuple(value)
+            elif key == 'state' and value:
+                value = value.lower()
+            values.append(value or False)
+        return (
+            self.env.uid, self.env.su, self.env.company.id, tuple(self.env.companies.ids),
+            bool(context.get('allowed_company_ids')), tuple(values), repr(domain),
+        )
+
+    @api.model
+    @contextmanager
+    def _query_get_scope(self):
+        """ Memoizes the filters compiled by ``_query_get`` during a report
+            run: yields the context to add to the environment of the run, the
+            memo is dropped at the end of the block. A nested scope reuses the
+            memo of the enclosing one.
+        """
+        if self.env.context.get('query_get_scope'):
+            yield {}
+            return
+        token = uuid.uuid4().hex
+        scopes = self.env.cr.cache.setdefault('account_move_line_query_get', {})
+        scopes[token] = {}
+        try:
+            yield {'query_get_scope': token}
+        finally:
+            scopes.pop(token, None)
+
     @api.model
     def _query_get(self, domain=None):
-        self.check_access_rights('read')
+        """ Returns the compiled filter (tables, where clause, params) of the
+            journal items selected by the report context.
 
-        context = dict(self._context or {})
+            Reports call it many times with the same context while printing,
+            so within a :meth:`_query_get_scope` the compiled filters are
+            memoized for the duration of the report run.
+        """
+        self.check_access_rights('read')
         domain = domain or []
         if not isinstance(domain, (list, tuple)):
             domain = ast.literal_eval(domain)
+        token = self.env.context.get('query_get_scope')
+        cache = self.env.cr.cache.get('account_move_line_query_get', {}).get(token) if token else None
+        if cache is None:
+            tables, where_clause, where_params = self._compile_query_get(list(domain))
+        else:
+            key = self._get_query_get_key(domain)
+            if key not in cache:
+                cache[key] = self._compile_query_get(list(domain))
+            tables, where_clause, where_params = cache[key]
+        return MoveLineFilter(tables, where_clause, list(where_params))
+
+    @api.model
+    def _compile_query_get(self, domain):
+        context = dict(self._context or {})
 
         date_field = 'date'
         if context.get('aged_balance'):
@@ -75,4 +165,31 @@ class AccountMoveLine(models.Model):
             self._apply_ir_rules(query)
 
             tables, where_clause, where_clause_params = query.get_sql()
-        return tables, where_clause, where_clause_params
+        return tables, where_clause, tuple(where_clause_params)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        # journal items added to a posted entry
+        lines = super(AccountMoveLine, self).create(vals_list)
+        if not self.env.context.get('skip_balance_snapshot'):
+            self.env['account.balance.snapshot'].sudo()._update_from_move_lines(
+                lines.filtered(lambda line: line.parent_state == 'posted').ids)
+        return lines
+
+    def unlink(self):
+        # journal items removed from a posted entry
+        if not self.env.context.get('skip_balance_snapshot'):
+            self.env['account.balance.snapshot'].sudo()._update_from_move_lines(
+                self.filtered(lambda line: line.parent_state == 'posted').ids, sign=-1)
+        return super(AccountMoveLine, self).unlink()
+
+    def write(self, vals):
+        # keep the balance snapshots of posted entries in sync
+        if self.env.context.get('skip_balance_snapshot') or not any(field in vals for field in SNAPSHOT_FIELDS):
+            return super(AccountMoveLine, self).write(vals)
+        Snapshot = self.env['account.balance.snapshot'].sudo()
+        posted = self.filtered(lambda line: line.parent_state == 'posted')
+        Snapshot._update_from_move_lines(posted.ids, sign=-1)
+        res = super(AccountMoveLine, self).write(vals)
+        Snapshot._update_from_move_lines(posted.filtered(lambda line: line.parent_state == 'posted').ids)
+        return res
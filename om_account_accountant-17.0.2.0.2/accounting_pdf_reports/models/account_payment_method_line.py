@@ -0,0 +1,20 @@
+from odoo import api, models
+
+
+class AccountPaymentMethodLine(models.Model):
+    _inherit = "account.payment.method.line"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        # the payment accounts of the journals are cached
+        self.env.registry.clear_cache()
+        return super(AccountPaymentMethodLine, self).create(vals_list)
+
+    def write(self, vals):
+        if 'payment_account_id' in vals or 'journal_id' in vals:
+            self.env.registry.clear_cache()
+        return super(AccountPaymentMethodLine, self).write(vals)
+
+    def unlink(self):
+        self.env.registry.clear_cache()
+        return super(AccountPaymentMethodLine, self).unlink()
@@ -0,0 +1,230 @@
+import csv
+import gzip
+import io
+import tempfile
+from datetime import timedelta
+
+import xlsxwriter
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+EXPORT_MIMETYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'application/gzip',
+}
+EXPORT_EXTENSIONS = {
+    'xlsx': 'xlsx',
+    'csv': 'csv.gz',
+}
+# minutes after which the exported files are removed
+EXPORT_ATTACHMENT_TTL = 60
+
+
+class AccountReportExport(models.AbstractModel):
+    _name = "account.report.export"
+    _description = "Accounting Report Tabular Export"
+
+    def _get_exporters(self):
+        """ Returns a dictionary {report name: method} of the methods turning
+            the values of the report into (headers, rows).
+        """
+        return {
+            'accounting_pdf_reports.report_general_ledger': self._rows_general_ledger,
+            'accounting_pdf_reports.report_trialbalance': self._rows_trial_balance,
+            'accounting_pdf_reports.report_partnerledger': self._rows_partner_ledger,
+            'accounting_pdf_reports.report_agedpartnerbalance': self._rows_aged_partner,
+            'accounting_pdf_reports.report_journal': self._rows_journal,
+            'accounting_pdf_reports.report_tax': self._rows_tax,
+        }
+
+    @api.model
+    def _get_report_context(self, data):
+        """ Context the report values are computed in, as when they are
+            rendered from the wizard.
+        """
+        context = {}
+        if data and data.get('model'):
+            active_ids = data.get('ids') or []
+            context.update(active_model=data['model'], active_ids=active_ids,
+                           active_id=active_ids and active_ids[0] or False)
+        return context
+
+    @api.model
+    def _export(self, report, res_ids, data, export_format):
+        """ Exports ``report`` in ``export_format`` ('xlsx' or 'csv') from its
+            ``_get_report_values``, without going through HTML/PDF.
+
+            Returns a tuple (content, file extension, mimetype).
+        """
+        exporter = self._get_exporters().get(report.report_name)
+        if not exporter or export_format not in EXPORT_MIMETYPES:
+            raise UserError(_("The report %s cannot be exported to %s.", report.name, export_format))
+        with self.env['ir.actions.report']._profile_report(report.report_name) as profile, \
+                self.env['account.move.line']._query_get_scope() as scope:
+            report_model = self.env['report.%s' % report.report_name].with_context(
+                self._get_report_context(data), stream_move_lines=True, **scope)
+            if profile:
+                with profile.phase('values'):
+                    values = report_model._get_report_values(res_ids, data=data)
+                    headers, rows = exporter(values)
+                # the rows are computed lazily, while they are written
+                rows = self._profile_rows(rows, profile)
+            else:
+                values = report_model._get_report_values(res_ids, data=data)
+                headers, rows = exporter(values)
+            if export_format == 'xlsx':
+                content = self._write_xlsx(report.name, headers, rows)
+            else:
+                content = self._write_csv(headers, rows)
+        return content, EXPORT_EXTENSIONS[export_format], EXPORT_MIMETYPES[export_format]
+
+    @api.model
+    def _profile_rows(self, rows, profile):
+        """ Yields the ``rows``, the time spent computing them counting in
+            the 'values' phase of the profile and the rest in 'write'.
+        """
+        rows = iter(rows)
+        while True:
+            with profile.phase('values'):
+                row = next(rows, None)
+            if row is None:
+                return
+            with profile.phase('write'):
+                yield row
+
+    @api.model
+    def _export_action(self, report, docids, data, export_format):
+        """ Exports ``report`` to an attachment and returns its download
+            action. The attachment is linked to this model, so that it is
+            removed by ``_gc_export_attachments`` once downloaded.
+        """
+        res_ids = docids.ids if isinstance(docids, models.Model) else docids
+        content, extension, mimetype = self._export(report, res_ids, data, export_format)
+        attachment = self.env['ir.attachment'].create({
+            'name': '%s.%s' % (report.name, extension),
+            'raw': content,
+            'mimetype': mimetype,
+            'res_model': self._name,
+            'res_id': False,
+        })
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/web/content/%s?download=true' % attachment.id,
+            'target': 'self',
+        }
+
+    @api.autovacuum
+    def _gc_export_attachments(self):
+        """ Removes the exported files older than the TTL """
+        expiry = fields.Datetime.now() - timedelta(minutes=EXPORT_ATTACHMENT_TTL)
+        self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('create_date', '<', expiry),
+        ]).unlink()
+
+    @api.model
+    def _write_xlsx(self, sheet_name, headers, rows):
+        """ Writes the rows one by one in constant memory """
+        with tempfile.NamedTemporaryFile(suffix='.xlsx') as f:
+            workbook = xlsxwriter.Workbook(f.name, {
+                'constant_memory': True,
+                'default_date_format': 'yyyy-mm-dd',
+            })
+            sheet = workbook.add_worksheet(sheet_name[:31])
+            bold = workbook.add_format({'bold': True})
+            sheet.write_row(0, 0, headers, bold)
+            for row_index, row in enumerate(rows, 1):
+                sheet.write_row(row_index, 0, [self._cell(value) for value in row])
+            workbook.close()
+            f.seek(0)
+            return f.read()
+
+    @api.model
+    def _write_csv(self, headers, rows):
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb') as gz:
+            stream = io.TextIOWrapper(gz, encoding='utf-8', newline='')
+            writer = csv.writer(stream)
+            writer.writerow(headers)
+            for row in rows:
+                writer.writerow([self._cell(value) for value in row])
+            stream.flush()
+            stream.detach()
+        return buffer.getvalue()
+
+    @api.model
+    def _cell(self, value):
+        if value is None or value is False:
+            return ''
+        return value
+
+    def _rows_general_ledger(self, values):
+        headers = [_('Account'), _('Account Name'), _('Date'), _('JRNL'), _('Partner'), _('Ref'),
+                   _('Move'), _('Entry Label'), _('Debit'), _('Credit'), _('Balance'),
+                   _('Amount Currency'), _('Currency')]
+
+        def rows():
+            for account in values['Accounts']:
+                for line in account['move_lines']:
+                    yield (account['code'], account['name'], line['ldate'], line['lcode'],
+                           line['partner_name'], line['lref'], line['move_name'], line['lname'],
+                           line['debit'], line['credit'], line['balance'],
+                           line['amount_currency'], line['currency_code'])
+        return headers, rows()
+
+    def _rows_trial_balance(self, values):
+        headers = [_('Code'), _('Account'), _('Debit'), _('Credit'), _('Balance')]
+        rows = ((account['code'], account['name'], account['debit'], account['credit'], account['balance'])
+                for account in values['Accounts'])
+        return headers, rows
+
+    def _rows_partner_ledger(self, values):
+        headers = [_('Partner Ref'), _('Partner'), _('Date'), _('JRNL'), _('Account'), _('Ref'),
+                   _('Debit'), _('Credit'), _('Balance'), _('Amount Currency'), _('Currency')]
+        data, lines = values['data'], values['lines']
+
+        def rows():
+            for partner in values['docs']:
+                for line in lines(data, partner):
+                    yield (partner.ref, partner.name, line['date'], line['code'], line['a_code'],
+                           line['displayed_name'], line['debit'], line['credit'], line['progress'],
+                           line['amount_currency'], line['currency_code'])
+        return headers, rows()
+
+    def _rows_aged_partner(self, values):
+        data = values['data']
+        headers = [_('Partners'), _('Not due')] + [data[str(i)]['name'] for i in range(4, -1, -1)] + [_('Total')]
+
+        def rows():
+            for partner in values['get_partner_lines']:
+                yield [partner['name'], partner['direction']] + \
+                      [partner[str(i)] for i in range(4, -1, -1)] + [partner['total']]
+            total = values['get_direction']
+            if total:
+                yield [_('Account Total'), total[6]] + [total[i] for i in range(4, -1, -1)] + [total[5]]
+        return headers, rows()
+
+    def _rows_journal(self, values):
+        headers = [_('Journal'), _('Move'), _('Date'), _('Account'), _('Partner'), _('Label'),
+                   _('Debit'), _('Credit'), _('Amount Currency'), _('Currency')]
+
+        def rows():
+            for journal in values['docs']:
+                for aml in values['lines'][journal.id]:
+                    yield (journal.name, aml.move_name, aml.date, aml.account_code,
+                           aml.partner_name, aml.name, aml.debit, aml.credit,
+                           aml.amount_currency, aml.currency_id.name)
+        return headers, rows()
+
+    def _rows_tax(self, values):
+        date_ranges = values['data'].get('date_ranges') or []
+        headers = [_('Type'), _('Tax Group'), _('Tax'), _('Net'), _('Tax Amount')]
+        for date_range in date_ranges[1:]:
+            headers += ['%s %s' % (_('Net'), date_range['name']), '%s %s' % (_('Tax Amount'), date_range['name'])]
+        labels = {'sale': _('Sale'), 'purchase': _('Purchase')}
+        rows = ([labels[tax_type], tax['group'], tax['name']] +
+                [amount for period in tax['periods'][:len(date_ranges) or 1] for amount in (period['net'], period['tax'])]
+                for tax_type in ('sale', 'purchase')
+                for tax in values['lines'].get(tax_type, []))
+        return headers, rows
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from odoo import api, fields, models, _
+from odoo.tools import date_utils
+
+_logger = logging.getLogger(__name__)
+
+# minutes during which an identical request is served from the stored result
+DEFAULT_JOB_TTL = 60
+# minutes after which a running job is considered lost (worker crash)
+DEFAULT_JOB_TIMEOUT = 120
+
+
+class AccountReportJob(models.Model):
+    _name = "account.report.job"
+    _description = "Accounting Report Job"
+    _order = 'id desc'
+
+    name = fields.Char('Report', required=True, readonly=True)
+    report_id = fields.Many2one('ir.actions.report', 'Report Action', required=True, readonly=True, ondelete='cascade')
+    res_model = fields.Char('Model', readonly=True)
+    res_ids = fields.Text('Records', readonly=True, default='[]')
+    data = fields.Text('Parameters', readonly=True)
+    params_hash = fields.Char('Parameters Hash', required=True, readonly=True, index=True)
+    user_id = fields.Many2one('res.users', 'User', required=True, readonly=True, default=lambda self: self.env.user)
+    company_id = fields.Many2one('res.company', 'Company', required=True, readonly=True, default=lambda self: self.env.company)
+    allowed_company_ids = fields.Text('Companies', readonly=True, default=lambda self: json.dumps(self.env.companies.ids))
+    lang = fields.Char('Language', readonly=True)
+    export_format = fields.Selection([('pdf', 'PDF'),
+                                      ('xlsx', 'XLSX'),
+                                      ('csv', 'CSV (gzip)'),
+                                      ], string='Format', required=True, readonly=True, default='pdf')
+    state = fields.Selection([('queued', 'Queued'),
+                              ('running', 'Running'),
+                              ('done', 'Done'),
+                              ('failed', 'Failed'),
+                              ], string='Status', required=True, readonly=True, default='queued', index=True)
+    progress = fields.Integer('Progress', readonly=True, default=0)
+    date_start = fields.Datetime('Started On', readonly=True)
+    date_done = fields.Datetime('Done On', readonly=True)
+    attachment_id = fields.Many2one('ir.attachment', 'Result', readonly=True, ondelete='set null')
+    error = fields.Text('Error', readonly=True)
+
+    @api.model
+    def _get_ttl(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'accounting_pdf_reports.report_job_ttl', DEFAULT_JOB_TTL))
+
+    @api.model
+    def _get_timeout(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'accounting_pdf_reports.report_job_timeout', DEFAULT_JOB_TIMEOUT))
+
+    @api.model
+    def _get_params_hash(self, report, res_ids, data, export_format='pdf'):
+        """ Hashes the parameters of the request. The id of the wizard the
+            form was read from is left out, as each print uses a new wizard.
+        """
+        if data and data.get('form'):
+            form = dict(data['form'])
+            form.pop('id', None)
+            data = dict(data, form=form)
+        params = json.dumps({
+            'report': report.report_name,
+            'export_format': export_format,
+            'res_ids': res_ids,
+            'data': data,
+            'user_id': self.env.uid,
+            'company_ids': self.env.companies.ids,
+            'lang': self.env.lang,
+        }, sort_keys=True, default=date_utils.json_default)
+        return hashlib.sha256(params.encode()).hexdigest()
+
+    @api.model
+    def _enqueue(self, report, docids, data=None, export_format='pdf'):
+        """ Queues the rendering of ``report`` and returns the action showing
+            the job. An identical request still running, or done within the
+            TTL, is returned instead of a new job.
+        """
+        if isinstance(docids, models.Model):
+            # the reports printed from a wizard are computed from its data:
+            # the wizard itself may be deleted by the transient vacuum before
+            # the job runs
+            res_ids = [] if docids._transient else docids.ids
+        elif isinstance(docids, int):
+            res_ids = [docids]
+        else:
+            res_ids = list(docids or [])
+        params_hash = self._get_params_hash(report, res_ids, data, export_format=export_format)
+        now = fields.Datetime.now()
+        expiry = now - timedelta(minutes=self._get_ttl())
+        timeout = now - timedelta(minutes=self._get_timeout())
+        job = self.search([
+            ('params_hash', '=', params_hash),
+            '|', '|', ('state', '=', 'queued'),
+            '&', ('state', '=', 'running'), ('date_start', '>=', timeout),
+            '&', '&', ('state', '=', 'done'), ('attachment_id', '!=', False), ('date_done', '>=', expiry),
+        ], limit=1)
+        if not job:
+            job = self.create({
+                'name': report.name,
+                'report_id': report.id,
+                'res_model': report.model,
+                'res_ids': json.dumps(res_ids),
+                'data': json.dumps(data, default=date_utils.json_default),
+                'params_hash': params_hash,
+                'lang': self.env.lang,
+                'export_format': export_format,
+            })
+            self.env.ref('accounting_pdf_reports.ir_cron_account_report_job')._trigger()
+        return job._get_action()
+
+    def _get_action(self):
+        self.ensure_one()
+        return {
+            'name': _('Report Job'),
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def action_download(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/web/content/%s?download=true' % self.attachment_id.id,
+            'target': 'self',
+        }
+
+    def action_refresh(self):
+        return self._get_action()
+
+    def _set_progress(self, progress):
+        """ Publishes the progress of the job from a separate transaction, so
+            that it is visible while the job is running.
+        """
+        with self.pool.cursor() as cr:
+            cr.execute("UPDATE account_report_job SET progress = %s WHERE id IN %s", (progress, tuple(self.ids)))
+
+    @api.model
+    def _cron_process_jobs(self):
+        """ Renders the queued jobs one after the other. Jobs are claimed with
+            SKIP LOCKED so that several workers can process the queue.
+        """
+        self._fail_stale_jobs()
+        self.env.cr.commit()
+        while True:
+            self.env.cr.execute("""
+                SELECT id FROM account_report_job
+                WHERE state = 'queued'
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED""")
+            row = self.env.cr.fetchone()
+            if not row:
+                break
+            job = self.browse(row[0])
+            job.write({'state': 'running', 'progress': 10, 'date_start': fields.Datetime.now()})
+            self.env.cr.commit()
+            try:
+                job._render()
+                self.env.cr.commit()
+            except Exception:
+                self.env.cr.rollback()
+                _logger.exception("Report job %s failed", job.id)
+                job.write({'state': 'failed', 'error': traceback.format_exc(), 'date_done': fields.Datetime.now()})
+                self.env.cr.commit()
+
+    @api.model
+    def _fail_stale_jobs(self):
+        """ Fails the jobs running for longer than the timeout: their worker
+            died without setting their result.
+        """
+        timeout = fields.Datetime.now() - timedelta(minutes=self._get_timeout())
+        jobs = self.search([('state', '=', 'running'), ('date_start', '<', timeout)])
+        if jobs:
+            _logger.warning("Report jobs %s timed out", jobs.ids)
+            jobs.write({
+                'state': 'failed',
+                'error': _('The job did not finish within %s minutes.', self._get_timeout()),
+                'date_done': fields.Datetime.now(),
+            })
+
+    def _render(self):
+        self.ensure_one()
+        report = self.report_id.with_user(self.user_id).with_context(
+            lang=self.lang,
+            allowed_company_ids=json.loads(self.allowed_company_ids or '[]') or [self.company_id.id],
+            report_job_id=self.id,
+            discard_logo_check=True,
+        )
+        data = json.loads(self.data or 'null')
+        if data and data.get('model'):
+            # the reports read the records the wizard was opened on from the context
+            active_ids = data.get('ids') or []
+            report = report.with_context(active_model=data['model'], active_ids=active_ids,
+                                         active_id=active_ids and active_ids[0] or False)
+        res_ids = json.loads(self.res_ids)
+        if self.export_format == 'pdf':
+            content, report_type = report._render(report.report_name, res_ids, data=data)
+            extension = 'pdf' if report_type == 'pdf' else report_type
+            mimetype = 'application/pdf' if report_type == 'pdf' else 'text/%s' % report_type
+        else:
+            content, extension, mimetype = self.env['account.report.export'].with_env(report.env)._export(
+                report, res_ids, data, self.export_format)
+        self._set_progress(90)
+        attachment = self.env['ir.attachment'].create({
+            'name': '%s.%s' % (self.name, extension),
+            'raw': content,
+            'res_model': self._name,
+            'res_id': self.id,
+            'mimetype': mimetype,
+        })
+        self.write({
+            'state': 'done',
+            'progress': 100,
+            'attachment_id': attachment.id,
+            'date_done': fields.Datetime.now(),
+        })
+        self.env['bus.bus']._sendone(self.user_id.partner_id, 'simple_notification', {
+            'type': 'success',
+            'title': _('Report Ready'),
+            'message': _('%s is ready to download.', self.name),
+        })
+
+    @api.autovacuum
+    def _gc_expired_jobs(self):
+        """ Removes the jobs, and their results, older than the TTL """
+        self._fail_stale_jobs()
+        expiry = fields.Datetime.now() - timedelta(minutes=self._get_ttl())
+        jobs = self.search([('state', 'in', ('done', 'failed')), ('date_done', '<', expiry)])
+        jobs.attachment_id.unlink()
+        jobs.unlink()
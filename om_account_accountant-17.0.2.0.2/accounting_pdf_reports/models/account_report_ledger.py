@@ -0,0 +1,296 @@
+import uuid
+from itertools import groupby
+
+from odoo import models
+
+# number of move lines fetched per round trip by the streaming mode
+STREAM_FETCH_SIZE = 2000
+# context keys of the report run, kept when switching to the wizard context
+RUN_CONTEXT_KEYS = ['stream_move_lines', 'query_get_scope']
+
+
+class AccountReportLedger(models.AbstractModel):
+    """ Move lines of a set of accounts with their running balance, shared by
+        the ledger reports (general ledger, cash book, bank book...). The
+        ``_query_get`` filters are taken from the context.
+    """
+    _name = "account.report.ledger"
+    _description = "Accounting Ledger Engine"
+
+    def _with_report_context(self, context):
+        """ Switches to the ``_query_get`` context of the wizard, keeping the
+            keys of the report run (streaming mode, memo of the filters).
+        """
+        run_context = dict((key, self.env.context[key]) for key in RUN_CONTEXT_KEYS if key in self.env.context)
+        return self.with_context(dict(context, **run_context))
+
+    def _get_move_line_context(self, analytic_account_ids, partner_ids, initial_bal=False):
+        """ Returns the ``_query_get`` context of the move lines selected in the wizard """
+        context = dict(self.env.context)
+        if initial_bal:
+            context['date_from'] = self.env.context.get('date_from')
+            context['date_to'] = False
+            context['initial_bal'] = True
+        if analytic_account_ids:
+            context['analytic_account_ids'] = analytic_account_ids
+        if partner_ids:
+            context['partner_ids'] = partner_ids
+        return context
+
+    def _get_move_line_filters(self, analytic_account_ids, partner_ids, initial_bal=False):
+        """ Returns the where clause (aliased on ``l`` and ``m``) and its
+            parameters for the move lines selected in the wizard.
+        """
+        context = self._get_move_line_context(analytic_account_ids, partner_ids, initial_bal=initial_bal)
+        return self.env['account.move.line'].with_context(context)._query_get().aliased()
+
+    def _get_initial_balances(self, accounts, analytic_account_ids, partner_ids):
+        """ Returns a dictionary {account_id: 'Initial Balance' line} """
+        context = self._get_move_line_context(analytic_account_ids, partner_ids, initial_bal=True)
+        balances = self.env['account.balance.snapshot'].with_context(context)._compute_account_balances(accounts.ids)
+        return {
+            account_id: self._get_initial_balance_line(account_id, values['debit'], values['credit'])
+            for account_id, values in balances.items()
+        }
+
+    def _get_initial_balance_line(self, account_id, debit, credit):
+        return {
+            'lid': 0, 'account_id': account_id, 'ldate': '', 'lcode': '',
+            'amount_currency': 0.0, 'analytic_account_id': '', 'lref': '',
+            'lname': 'Initial Balance', 'debit': debit, 'credit': credit,
+            'balance': debit - credit, 'lpartner_id': '', 'move_name': '',
+            'move_id': '', 'currency_code': '', 'currency_id': None,
+            'invoice_id': '', 'invoice_type': '', 'invoice_number': '',
+            'partner_name': '',
+        }
+
+    def _get_running_balance_sql(self, sql_sort):
+        """ Returns the window expression computing the cumulated balance of
+            a move line within its account, in the display order.
+        """
+        return ("SUM(COALESCE(l.debit,0) - COALESCE(l.credit,0)) OVER ("
+                "PARTITION BY l.account_id ORDER BY " + sql_sort + ", l.id "
+                "ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)")
+
+    def _get_move_lines_query(self, accounts, analytic_account_ids, partner_ids, sortby, group_by_account=False):
+        """ Returns the query (and its parameters) of the move lines of
+            ``accounts`` with their running balance, in the display order.
+            With ``group_by_account``, the lines are ordered by account first,
+            in the order of the recordset.
+        """
+        sql_sort = 'l.date, l.move_id'
+        if sortby == 'sort_journal_partner':
+            sql_sort = 'j.code, p.name, l.move_id'
+        filters, where_params = self._get_move_line_filters(analytic_account_ids, partner_ids)
+        order_by = sql_sort + ', l.id'
+        params = (tuple(accounts.ids),) + tuple(where_params)
+        if group_by_account:
+            order_by = 'array_position(%s, l.account_id), ' + order_by
+            params += (list(accounts.ids),)
+        sql = ('''SELECT l.id AS lid, l.account_id AS account_id,
+            l.date AS ldate, j.code AS lcode, l.currency_id,
+            l.amount_currency, '' AS analytic_account_id,
+            l.ref AS lref, l.name AS lname, COALESCE(l.debit,0) AS debit,
+            COALESCE(l.credit,0) AS credit,
+            ''' + self._get_running_balance_sql(sql_sort) + ''' AS balance,
+            m.name AS move_name, c.symbol AS currency_code,
+            p.name AS partner_name
+            FROM account_move_line l
+            JOIN account_move m ON (l.move_id=m.id)
+            LEFT JOIN res_currency c ON (l.currency_id=c.id)
+            LEFT JOIN res_partner p ON (l.partner_id=p.id)
+            JOIN account_journal j ON (l.journal_id=j.id)
+            JOIN account_account acc ON (l.account_id = acc.id)
+            WHERE l.account_id IN %s ''' + filters + '''
+            ORDER BY ''' + order_by)
+        return sql, params
+
+    def _get_account_move_entry(self, accounts, analytic_account_ids,
+                                partner_ids, init_balance,
+                                sortby, display_account):
+        """
+        :param:
+                accounts: the recordset of accounts
+                analytic_account_ids: the recordset of analytic accounts
+                init_balance: boolean value of initial_balance
+                sortby: sorting by date or partner and journal
+                display_account: type of account(receivable, payable and both)
+
+        Returns a dictionary of accounts with following key and value {
+                'code': account code,
+                'name': account name,
+                'debit': sum of total debit amount,
+                'credit': sum of total credit amount,
+                'balance': total balance,
+                'amount_currency': sum of amount_currency,
+                'move_lines': list of move line
+        }
+        """
+        cr = self.env.cr
+        move_lines = {x: [] for x in accounts.ids}
+
+        # Get the initial move lines
+        initial_balances = {}
+        if init_balance:
+            initial_balances = self._get_initial_balances(accounts, analytic_account_ids, partner_ids)
+            for account_id, row in initial_balances.items():
+                row.pop('account_id')
+                move_lines[account_id].append(row)
+
+        # Get move lines base on sql query, the running balance of each
+        # account is computed by the database and seeded with its initial balance
+        sql, params = self._get_move_lines_query(accounts, analytic_account_ids, partner_ids, sortby)
+        cr.execute(sql, params)
+
+        for row in cr.dictfetchall():
+            account_id = row.pop('account_id')
+            if account_id in initial_balances:
+                row['balance'] += initial_balances[account_id]['balance']
+            move_lines[account_id].append(row)
+
+        # Calculate the debit, credit and balance for Accounts
+        account_res = []
+        for account in accounts:
+            currency = account.currency_id and account.currency_id or account.company_id.currency_id
+            res = dict((fn, 0.0) for fn in ['credit', 'debit', 'balance'])
+            res['code'] = account.code
+            res['name'] = account.name
+            res['move_lines'] = move_lines[account.id]
+            for line in res.get('move_lines'):
+                res['debit'] += line['debit']
+                res['credit'] += line['credit']
+                res['balance'] = line['balance']
+            if display_account == 'all':
+                account_res.append(res)
+            if display_account == 'movement' and res.get('move_lines'):
+                account_res.append(res)
+            if display_account == 'not_zero' and not currency.is_zero(res['balance']):
+                account_res.append(res)
+        return account_res
+
+    def _get_account_totals(self, accounts, analytic_account_ids, partner_ids, initial_balances):
+        """ Returns a dictionary {account_id: {'debit', 'credit', 'balance', 'count'}}
+            aggregated in the database, initial balances included.
+        """
+        filters, where_params = self._get_move_line_filters(analytic_account_ids, partner_ids)
+        sql = ('''SELECT l.account_id AS account_id, COUNT(l.id) AS count,
+            COALESCE(SUM(l.debit),0) AS debit, COALESCE(SUM(l.credit),0) AS credit
+            FROM account_move_line l
+            JOIN account_move m ON (l.move_id=m.id)
+            WHERE l.account_id IN %s ''' + filters + ''' GROUP BY l.account_id''')
+        params = (tuple(accounts.ids),) + tuple(where_params)
+        self.env.cr.execute(sql, params)
+        totals = {x: {'debit': 0.0, 'credit': 0.0, 'count': 0} for x in accounts.ids}
+        for row in self.env.cr.dictfetchall():
+            totals[row.pop('account_id')].update(row)
+        for account_id, line in initial_balances.items():
+            totals[account_id]['debit'] += line['debit']
+            totals[account_id]['credit'] += line['credit']
+            totals[account_id]['count'] += 1
+        for values in totals.values():
+            values['balance'] = values['debit'] - values['credit']
+        return totals
+
+    def _iter_move_lines(self, accounts, analytic_account_ids, partner_ids,
+                         initial_balances, sortby, fetch_size=None):
+        """ Yields the move lines of ``accounts`` grouped by account (in the
+            order of the recordset), each account starting with its initial
+            balance line. Lines are read through a server-side cursor,
+            ``fetch_size`` rows at a time, so memory does not grow with the
+            period.
+        """
+        cr = self.env.cr
+        fetch_size = fetch_size or STREAM_FETCH_SIZE
+
+        sql, params = self._get_move_lines_query(
+            accounts, analytic_account_ids, partner_ids, sortby, group_by_account=True)
+
+        # initial balance lines still to be sent, in the order of the accounts
+        position = {account_id: index for index, account_id in enumerate(accounts.ids)}
+        pending = [x for x in accounts.ids if x in initial_balances]
+        # initial balance each account's running balance is seeded with
+        openings = {}
+
+        # several ledgers may be streamed in the same transaction
+        cursor_name = 'ledger_lines_%s' % uuid.uuid4().hex
+        cr.execute('DECLARE ' + cursor_name + ' NO SCROLL CURSOR FOR ' + sql, params)
+        try:
+            while True:
+                cr.execute('FETCH %s FROM ' + cursor_name, (fetch_size,))
+                rows = cr.dictfetchall()
+                if not rows:
+                    break
+                for row in rows:
+                    account_id = row['account_id']
+                    if account_id not in openings:
+                        # flush the accounts having only an initial balance
+                        while pending and position[pending[0]] < position[account_id]:
+                            yield initial_balances[pending.pop(0)]
+                        openings[account_id] = 0.0
+                        if pending and pending[0] == account_id:
+                            pending.pop(0)
+                            openings[account_id] = initial_balances[account_id]['balance']
+                            yield initial_balances[account_id]
+                    row['balance'] += openings[account_id]
+                    yield row
+        finally:
+            cr.execute('CLOSE ' + cursor_name)
+        for opening_id in pending:
+            yield initial_balances[opening_id]
+
+    def _stream_account_move_entry(self, accounts, analytic_account_ids,
+                                   partner_ids, init_balance, sortby,
+                                   display_account, fetch_size=None):
+        """ Streaming version of :meth:`_get_account_move_entry`.
+
+            Account totals are aggregated in the database first, then the
+            accounts to display are yielded one by one with ``move_lines``
+            being an iterator over their lines. Each account's lines must be
+            consumed before asking for the next account, which is what the
+            report template (or an export sink) naturally does.
+        """
+        initial_balances = {}
+        if init_balance:
+            initial_balances = self._get_initial_balances(accounts, analytic_account_ids, partner_ids)
+        totals = self._get_account_totals(accounts, analytic_account_ids, partner_ids, initial_balances)
+
+        displayed_ids = []
+        for account in accounts:
+            currency = account.currency_id and account.currency_id or account.company_id.currency_id
+            total = totals[account.id]
+            if display_account == 'all' \
+                    or (display_account == 'movement' and total['count']) \
+                    or (display_account == 'not_zero' and not currency.is_zero(total['balance'])):
+                displayed_ids.append(account.id)
+        displayed = accounts.browse(displayed_ids)
+        if not displayed:
+            return
+
+        lines = groupby(
+            self._iter_move_lines(displayed, analytic_account_ids, partner_ids,
+                                  initial_balances, sortby, fetch_size=fetch_size),
+            key=lambda line: line['account_id'])
+        group = next(lines, None)
+        for account in displayed:
+            res = dict((fn, totals[account.id][fn]) for fn in ['credit', 'debit', 'balance'])
+            res['code'] = account.code
+            res['name'] = account.name
+            if group and group[0] == account.id:
+                res['move_lines'] = group[1]
+                yield res
+                group = next(lines, None)
+            else:
+                res['move_lines'] = iter(())
+                yield res
+
+    def _get_ledger_entries(self, accounts, analytic_account_ids, partner_ids,
+                            init_balance, sortby, display_account):
+        """ Returns the accounts of the ledger with their move lines, as a
+            list, or as a generator when the 'stream_move_lines' context key
+            is set (QWeb rendering and tabular exports).
+        """
+        if self.env.context.get('stream_move_lines'):
+            return self._stream_account_move_entry(
+                accounts, analytic_account_ids, partner_ids, init_balance, sortby, display_account)
+        return self._get_account_move_entry(
+            accounts, analytic_account_ids, partner_ids, init_balance, sortby, display_account)
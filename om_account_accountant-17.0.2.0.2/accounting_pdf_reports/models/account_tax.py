@@ -0,0 +1,46 @@
+from odoo import api, models, tools
+
+# fields changing the tree of taxes shown in the tax report
+TAX_TREE_FIELDS = ['type_tax_use', 'children_tax_ids', 'tax_group_id', 'sequence', 'active', 'company_id']
+
+
+class AccountTax(models.Model):
+    _inherit = "account.tax"
+
+    @api.model
+    @tools.ormcache('company_id')
+    def _get_tax_report_tree(self, company_id):
+        """ Returns the taxes reported in the tax report of the company, as a
+            tuple of (tax_id, type_tax_use, tax_group_id) in the tax order.
+            The taxes having children are reported through their children
+            without type of their own, under their own type. The tree is
+            cached per company and cleared when the taxes change.
+        """
+        taxes = self.sudo().with_context(active_test=True).search([
+            ('company_id', '=', company_id),
+            ('type_tax_use', '!=', 'none'),
+        ])
+        tree = {}
+        for tax in taxes:
+            if tax.children_tax_ids:
+                for child in tax.children_tax_ids:
+                    if child.type_tax_use != 'none':
+                        continue
+                    tree[child.id] = (child.id, tax.type_tax_use, child.tax_group_id.id)
+            else:
+                tree[tax.id] = (tax.id, tax.type_tax_use, tax.tax_group_id.id)
+        return tuple(tree.values())
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        self.env.registry.clear_cache()
+        return super(AccountTax, self).create(vals_list)
+
+    def write(self, vals):
+        if any(field in vals for field in TAX_TREE_FIELDS):
+            self.env.registry.clear_cache()
+        return super(AccountTax, self).write(vals)
+
+    def unlink(self):
+        self.env.registry.clear_cache()
+        return super(AccountTax, self).unlink()
@@ -0,0 +1,14 @@
+from odoo import models
+
+from .ir_actions_report import _profiling
+
+
+class Base(models.AbstractModel):
+    _inherit = 'base'
+
+    def _fetch_query(self, query, fields):
+        # fields missing from the cache, counted by the report profiling
+        profile = getattr(_profiling, 'profile', None)
+        if profile is not None:
+            profile.count_prefetch_miss()
+        return super(Base, self)._fetch_query(query, fields)
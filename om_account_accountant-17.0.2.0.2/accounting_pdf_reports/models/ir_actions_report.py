@@ -0,0 +1,226 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from odoo import api, models, tools
+from odoo.tools.profiler import Profiler
+
+_logger = logging.getLogger(__name__)
+
+# report run being profiled in the current thread
+_profiling = threading.local()
+
+
+class ReportProfile(object):
+    """ Statistics of one report run: SQL queries (through the query hooks of
+        the cursors of the threads of the run), rows fetched, fields read by
+        the ORM, the cache usage of the currency converters, and the time
+        spent in each phase of the rendering. The phases of parallel workers
+        are summed.
+    """
+
+    def __init__(self, report_name, sampling=False):
+        self.report_name = report_name
+        self.sampling = sampling
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.rows = 0
+        self.prefetch_misses = 0
+        self.phases = Counter()
+        self.duration = 0.0
+        self.samples = []
+        self.converters = []
+        self._lock = threading.Lock()
+        self._attached = None
+        self._profiler = None
+
+    def _query_hook(self, cr, query, params, start, delay):
+        rows = 0
+        if getattr(query, 'code', query).lstrip()[:6].upper() in ('SELECT', 'FETCH ', 'WITH '):
+            rows = max(cr.rowcount, 0)
+        with self._lock:
+            self.query_count += 1
+            self.sql_time += delay
+            self.rows += rows
+
+    def count_prefetch_miss(self):
+        """ Called by the ORM each time it fetches fields missing from the cache """
+        with self._lock:
+            self.prefetch_misses += 1
+
+    def add_converter(self, converter):
+        """ Counts the cache usage of a currency converter of the run """
+        with self._lock:
+            self.converters.append(converter)
+
+    def get_converter_stats(self):
+        stats = Counter()
+        for converter in self.converters:
+            stats.update(converter.stats())
+        return stats
+
+    @contextmanager
+    def attach(self):
+        """ Profiles the queries of the current thread as part of the run,
+            e.g. in the workers rendering a report in parallel.
+        """
+        thread = threading.current_thread()
+        if not hasattr(thread, 'query_hooks'):
+            thread.query_hooks = []
+        thread.query_hooks.append(self._query_hook)
+        previous = getattr(_profiling, 'profile', None)
+        _profiling.profile = self
+        try:
+            yield self
+        finally:
+            _profiling.profile = previous
+            thread.query_hooks.remove(self._query_hook)
+
+    def __enter__(self):
+        self._attached = self.attach()
+        self._attached.__enter__()
+        if self.sampling:
+            # only the thread starting the run is sampled
+            self._profiler = Profiler(collectors=['traces_async'], db=None,
+                                      description='report %s' % self.report_name)
+            self._profiler.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self._start
+        if self._profiler:
+            self._profiler.__exit__(exc_type, exc_value, traceback)
+            self.samples = self._profiler.collectors[0].entries
+        self._attached.__exit__(exc_type, exc_value, traceback)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] += time.perf_counter() - start
+
+    def get_summary(self):
+        phases = ''.join('%s %.3fs, ' % (name, self.phases[name]) for name in sorted(self.phases))
+        other = max(0.0, self.duration - sum(self.phases.values()))
+        rates = self.get_converter_stats()
+        return ("report %s: %.3fs (%sother %.3fs), "
+                "%s queries in %.3fs, %s rows fetched, %s prefetch misses, "
+                "currency rates: %s hits, %s misses, %s queries") % (
+            self.report_name, self.duration, phases, other,
+            self.query_count, self.sql_time, self.rows, self.prefetch_misses,
+            rates['hits'], rates['misses'], rates['queries'])
+
+    def get_folded_stacks(self):
+        """ Returns the samples in the folded format of flamegraph.pl (one
+            'frame;frame;... count' line per distinct stack), also read by
+            speedscope.
+        """
+        stacks = Counter()
+        for entry in self.samples:
+            stacks[';'.join('%s (%s:%s)' % (frame[2], os.path.basename(frame[0]), frame[1])
+                            for frame in entry['stack'])] += 1
+        return ''.join('%s %s\n' % (stack, count) for stack, count in stacks.items())
+
+
+class IrActionsReport(models.Model):
+    _inherit = "ir.actions.report"
+
+    def report_action(self, docids, data=None, config=True):
+        # wizards ask for a background rendering or a tabular export through the context
+        export_format = self.env.context.get('report_export_format') or 'pdf'
+        if self.env.context.get('report_in_background'):
+            return self.env['account.report.job']._enqueue(self, docids, data=data, export_format=export_format)
+        if export_format != 'pdf':
+            return self.env['account.report.export']._export_action(self, docids, data, export_format)
+        return super(IrActionsReport, self).report_action(docids, data=data, config=config)
+
+    @api.model
+    def _get_report_profiling_params(self):
+        """ Returns (enabled, threshold) of the report profiling: it is enabled
+            by the 'accounting_pdf_reports.report_profiling' parameter or the
+            'report_profiling' context key, and the runs slower than the
+            'accounting_pdf_reports.report_profiling_threshold' (seconds) are
+            sampled and dumped as a flamegraph.
+        """
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        enabled = self.env.context.get('report_profiling') or \
+            tools.str2bool(get_param('accounting_pdf_reports.report_profiling', 'False'))
+        threshold = float(get_param('accounting_pdf_reports.report_profiling_threshold', 0) or 0)
+        return bool(enabled), threshold
+
+    @api.model
+    @contextmanager
+    def _profile_report(self, report_name):
+        """ Profiles the report run in the block, when the profiling is
+            enabled. Yields the profile of the run, or None.
+        """
+        current = getattr(_profiling, 'profile', None)
+        if current is not None:
+            # nested rendering of the same run
+            yield current
+            return
+        enabled, threshold = self._get_report_profiling_params()
+        if not enabled or 'report.%s' % report_name not in self.env:
+            yield None
+            return
+        profile = ReportProfile(report_name, sampling=threshold > 0)
+        with profile:
+            yield profile
+        _logger.info(profile.get_summary())
+        if threshold and profile.duration >= threshold:
+            self._dump_report_profile(profile)
+
+    @api.model
+    def _get_report_profile(self):
+        """ Returns the profile of the report run of the current thread, or None """
+        return getattr(_profiling, 'profile', None)
+
+    @api.model
+    def _dump_report_profile(self, profile):
+        path = os.path.join(tools.config['data_dir'], 'report_profiles', self.env.cr.dbname)
+        os.makedirs(path, exist_ok=True)
+        filename = os.path.join(path, '%s-%s.folded' % (profile.report_name, time.strftime('%Y%m%d-%H%M%S')))
+        with open(filename, 'w') as f:
+            f.write(profile.get_folded_stacks())
+        _logger.info("Profile of the report %s dumped to %s", profile.report_name, filename)
+
+    def _get_rendering_context(self, report, docids, data):
+        # the ledgers stream their move lines from the database to the templates
+        self = self.with_context(stream_move_lines=True)
+        profile = getattr(_profiling, 'profile', None)
+        if profile is None:
+            return super(IrActionsReport, self)._get_rendering_context(report, docids, data)
+        with profile.phase('values'):
+            return super(IrActionsReport, self)._get_rendering_context(report, docids, data)
+
+    def _render_template(self, template, values=None):
+        profile = getattr(_profiling, 'profile', None)
+        if profile is None:
+            return super(IrActionsReport, self)._render_template(template, values=values)
+        with profile.phase('qweb'):
+            return super(IrActionsReport, self)._render_template(template, values=values)
+
+    def _render_qweb_html(self, report_ref, docids, data=None):
+        report = self._get_report(report_ref)
+        with self._profile_report(report.report_name), \
+                self.env['account.move.line']._query_get_scope() as scope:
+            return super(IrActionsReport, self.with_context(scope))._render_qweb_html(report_ref, docids, data=data)
+
+    def _render_qweb_pdf(self, report_ref, res_ids=None, data=None):
+        report = self._get_report(report_ref)
+        with self._profile_report(report.report_name), \
+                self.env['account.move.line']._query_get_scope() as scope:
+            self = self.with_context(scope)
+            if report.report_name == 'accounting_pdf_reports.report_general_ledger' and data and data.get('form'):
+                content = self.env['report.accounting_pdf_reports.report_general_ledger']._render_parallel_pdf(
+                    report_ref, res_ids, data)
+                if content is not None:
+                    return content, 'pdf'
+            return super(IrActionsReport, self)._render_qweb_pdf(report_ref, res_ids=res_ids, data=data)
@@ -0,0 +1,14 @@
+from odoo import api, models
+
+
+class ResCurrency(models.Model):
+    _inherit = "res.currency"
+
+    @api.model
+    def _get_converter(self, maxsize=4096):
+        # the converters of a profiled report run report their cache usage
+        converter = super(ResCurrency, self)._get_converter(maxsize=maxsize)
+        profile = self.env['ir.actions.report']._get_report_profile()
+        if profile is not None:
+            profile.add_converter(converter)
+        return converter
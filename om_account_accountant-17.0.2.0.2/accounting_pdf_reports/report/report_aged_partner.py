@@ -6,6 +6,20 @@ from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
 
+class AgedPartnerLines(dict):
+    """ Mapping {partner_id: [{'line', 'amount', 'period'}]} of the aged
+        move lines, loading the lines of a partner on first access.
+    """
+
+    def __init__(self, loader):
+        super(AgedPartnerLines, self).__init__()
+        self._loader = loader
+
+    def __missing__(self, partner_id):
+        self[partner_id] = self._loader(partner_id)
+        return self[partner_id]
+
+
 class ReportAgedPartnerBalance(models.AbstractModel):
     _name = 'report.accounting_pdf_reports.report_agedpartnerbalance'
     _description = 'Aged Partner Balance Report'
@@ -82,142 +96,113 @@ class ReportAgedPartnerBalance(models.AbstractModel):
         # Build a string like (1,2,3) for easy use in SQL query
         if not partner_ids:
             partner_ids = [partner['partner_id'] for partner in partners if partner['partner_id']]
-        lines = dict((partner['partner_id'] or False, []) for partner in partners)
         if not partner_ids:
             return [], [], {}
 
-        # This dictionary will store the not due amount of all partners
-        undue_amounts = {}
-        query = '''SELECT l.id
-                FROM account_move_line AS l, account_account, account_move am
-                WHERE (l.account_id = account_account.id) AND (l.move_id = am.id)
-                    AND (am.state IN %s)
-                    AND (account_account.account_type IN %s)
-                    AND (COALESCE(l.date_maturity,l.date) >= %s)\
-                    AND ((l.partner_id IN %s) OR (l.partner_id IS NULL))
-                AND (l.date <= %s)
-                AND l.company_id IN %s'''
-        cr.execute(query, (tuple(move_state), tuple(account_type), date_from,
-                           tuple(partner_ids), date_from, tuple(company_ids)))
-        aml_ids = cr.fetchall()
-        aml_ids = aml_ids and [x[0] for x in aml_ids] or []
-        for line in self.env['account.move.line'].browse(aml_ids):
-            partner_id = line.partner_id.id or False
-            if partner_id not in undue_amounts:
-                undue_amounts[partner_id] = 0.0
-            line_amount = line.company_id.currency_id._convert(line.balance,
-                                                               user_currency,
-                                                               company, date)
-            if user_currency.is_zero(line_amount):
-                continue
-            for partial_line in line.matched_debit_ids:
-                if partial_line.max_date <= date_from:
-                    line_currency = partial_line.company_id.currency_id
-                    line_amount += line_currency._convert(partial_line.amount,
-                                                          user_currency,
-                                                          company, date)
-            for partial_line in line.matched_credit_ids:
-                if partial_line.max_date <= date_from:
-                    line_currency = partial_line.company_id.currency_id
-                    line_amount -= line_currency._convert(partial_line.amount,
-                                                          user_currency,
-                                                          company, date)
-            if not self.env.user.company_id.currency_id.is_zero(line_amount):
-                undue_amounts[partner_id] += line_amount
-                lines[partner_id].append({
-                    'line': line,
-                    'amount': line_amount,
-                    'period': 6,
-                })
-
-        # Use one query per period and store results in history (a list variable)
-        # Each history will contain: history[1] = {'<partner_id>': <partner_debit-credit>}
-        history = []
-        for i in range(5):
-            args_list = (tuple(move_state), tuple(account_type), tuple(partner_ids),)
-            dates_query = '(COALESCE(l.date_maturity,l.date)'
-
-            if periods[str(i)]['start'] and periods[str(i)]['stop']:
-                dates_query += ' BETWEEN %s AND %s)'
-                args_list += (periods[str(i)]['start'], periods[str(i)]['stop'])
-            elif periods[str(i)]['start']:
-                dates_query += ' >= %s)'
-                args_list += (periods[str(i)]['start'],)
-            else:
-                dates_query += ' <= %s)'
-                args_list += (periods[str(i)]['stop'],)
-            args_list += (date_from, tuple(company_ids))
-
-            query = '''SELECT l.id
-                    FROM account_move_line AS l, account_account, account_move am
-                    WHERE (l.account_id = account_account.id) AND (l.move_id = am.id)
-                        AND (am.state IN %s)
-                        AND (account_account.account_type IN %s)
-                        AND ((l.partner_id IN %s) OR (l.partner_id IS NULL))
-                        AND ''' + dates_query + '''
-                    AND (l.date <= %s)
-                    AND l.company_id IN %s'''
-            cr.execute(query, args_list)
-            partners_amount = {}
-            aml_ids = cr.fetchall()
-            aml_ids = aml_ids and [x[0] for x in aml_ids] or []
-            for line in self.env['account.move.line'].browse(aml_ids):
-                partner_id = line.partner_id.id or False
-                if partner_id not in partners_amount:
-                    partners_amount[partner_id] = 0.0
-                line_currency_id = line.company_id.currency_id
-                line_amount = line_currency_id._convert(line.balance, user_currency, company, date)
-                if user_currency.is_zero(line_amount):
-                    continue
-                for partial_line in line.matched_debit_ids:
-                    if partial_line.max_date <= date_from:
-                        line_currency_id = partial_line.company_id.currency_id
-                        line_amount += line_currency_id._convert(
-                            partial_line.amount, user_currency, company, date)
-                for partial_line in line.matched_credit_ids:
-                    if partial_line.max_date <= date_from:
-                        line_currency_id = partial_line.company_id.currency_id
-                        line_amount -= line_currency_id._convert(
-                            partial_line.amount, user_currency, company, date)
-                if not self.env.user.company_id.currency_id.is_zero(line_amount):
-                    partners_amount[partner_id] += line_amount
-                    lines[partner_id].append({
-                        'line': line,
-                        'amount': line_amount,
-                        'period': i + 1,
-                        })
-            history.append(partners_amount)
+        # Residual amount as of date_from and aging bucket of every move line,
+        # computed in one statement. Buckets follow the 'period' of the lines:
+        # 6 is the not due amount, i + 1 the amount of periods[str(i)].
+        maturity = 'COALESCE(l.date_maturity, l.date)'
+        bucket = 'CASE WHEN ' + maturity + ' >= %(date_from)s THEN 6'
+        for i in range(4, 0, -1):
+            bucket += ' WHEN ' + maturity + ' >= %(start_' + str(i) + ')s THEN ' + str(i + 1)
+        bucket += ' ELSE 1 END'
+        residual = 'l.balance + COALESCE(matched_debit.amount, 0) - COALESCE(matched_credit.amount, 0)'
+        lines_query = '''
+            SELECT l.id, l.partner_id, rc.currency_id,
+                   ''' + bucket + ''' AS period,
+                   ''' + residual + ''' AS amount
+            FROM account_move_line AS l
+            JOIN account_account ON (l.account_id = account_account.id)
+            JOIN account_move am ON (l.move_id = am.id)
+            JOIN res_company rc ON (l.company_id = rc.id)
+            JOIN res_currency cur ON (rc.currency_id = cur.id)
+            LEFT JOIN LATERAL (
+                SELECT SUM(pr.amount) AS amount FROM account_partial_reconcile pr
+                WHERE pr.credit_move_id = l.id AND pr.max_date <= %(date_from)s
+            ) matched_debit ON TRUE
+            LEFT JOIN LATERAL (
+                SELECT SUM(pr.amount) AS amount FROM account_partial_reconcile pr
+                WHERE pr.debit_move_id = l.id AND pr.max_date <= %(date_from)s
+            ) matched_credit ON TRUE
+            WHERE (am.state IN %(move_state)s)
+                AND (account_account.account_type IN %(account_type)s)
+                AND ((l.partner_id IN %(partner_ids)s) OR (l.partner_id IS NULL))
+                AND (l.date <= %(date_from)s)
+                AND l.company_id IN %(company_ids)s
+                AND ABS(l.balance) >= cur.rounding / 2
+                AND ABS(''' + residual + ''') >= cur.rounding / 2'''
+        lines_params = {
+            'date_from': date_from,
+            'move_state': tuple(move_state),
+            'account_type': tuple(account_type),
+            'partner_ids': tuple(partner_ids),
+            'company_ids': tuple(company_ids),
+        }
+        for i in range(1, 5):
+            lines_params['start_' + str(i)] = periods[str(i)]['start']
+
+        converter = self.env['res.currency']._get_converter()
+
+        def convert(currency_id, amount):
+            currency = self.env['res.currency'].browse(currency_id)
+            return converter.convert(amount, currency, user_currency, company, date)
+
+        # Totals per partner and bucket, the line details are only loaded when asked for
+        cr.execute('''
+            SELECT partner_id, period, currency_id, SUM(amount) AS amount, COUNT(*) AS count
+            FROM (''' + lines_query + ''') AS aged_lines
+            GROUP BY partner_id, period, currency_id''', lines_params)
+        amounts = {}
+        line_counts = {}
+        for row in cr.dictfetchall():
+            partner_id = row['partner_id'] or False
+            partner_amounts = amounts.setdefault(partner_id, dict.fromkeys(range(1, 7), 0.0))
+            partner_amounts[row['period']] += convert(row['currency_id'], row['amount'])
+            line_counts[partner_id] = line_counts.get(partner_id, 0) + row['count']
+
+        def load_lines(partner_id):
+            query = 'SELECT * FROM (' + lines_query + ') AS aged_lines WHERE partner_id '
+            query += '= %(partner_id)s' if partner_id else 'IS NULL'
+            cr.execute(query + ' ORDER BY id', dict(lines_params, partner_id=partner_id))
+            rows = cr.dictfetchall()
+            move_lines = self.env['account.move.line'].browse([row['id'] for row in rows])
+            return [{
+                'line': line,
+                'amount': convert(row['currency_id'], row['amount']),
+                'period': row['period'],
+            } for line, row in zip(move_lines, rows)]
+
+        lines = AgedPartnerLines(load_lines)
+        browsed_partners = self.env['res.partner'].browse(
+            [partner['partner_id'] for partner in partners if partner['partner_id']])
+        browsed_partners = {partner.id: partner for partner in browsed_partners}
+        rounding = self.env.user.company_id.currency_id.rounding
 
         for partner in partners:
             if partner['partner_id'] is None:
                 partner['partner_id'] = False
             at_least_one_amount = False
             values = {}
-            undue_amt = 0.0
-            if partner['partner_id'] in undue_amounts:  # Making sure this partner actually was found by the query
-                undue_amt = undue_amounts[partner['partner_id']]
+            partner_amounts = amounts.get(partner['partner_id'], dict.fromkeys(range(1, 7), 0.0))
 
-            total[6] = total[6] + undue_amt
-            values['direction'] = undue_amt
-            if not float_is_zero(values['direction'], precision_rounding=self.env.user.company_id.currency_id.rounding):
+            total[6] = total[6] + partner_amounts[6]
+            values['direction'] = partner_amounts[6]
+            if not float_is_zero(values['direction'], precision_rounding=rounding):
                 at_least_one_amount = True
 
             for i in range(5):
-                during = False
-                if partner['partner_id'] in history[i]:
-                    during = [history[i][partner['partner_id']]]
                 # Adding counter
-                total[(i)] = total[(i)] + (during and during[0] or 0)
-                values[str(i)] = during and during[0] or 0.0
-                if not float_is_zero(values[str(i)],
-                                     precision_rounding=self.env.user.company_id.currency_id.rounding):
+                total[(i)] = total[(i)] + partner_amounts[i + 1]
+                values[str(i)] = partner_amounts[i + 1]
+                if not float_is_zero(values[str(i)], precision_rounding=rounding):
                     at_least_one_amount = True
             values['total'] = sum([values['direction']] + [values[str(i)] for i in range(5)])
             ## Add for total
             total[(i + 1)] += values['total']
             values['partner_id'] = partner['partner_id']
             if partner['partner_id']:
-                browsed_partner = self.env['res.partner'].browse(partner['partner_id'])
+                browsed_partner = browsed_partners[partner['partner_id']]
                 values['name'] = browsed_partner.name and len(
                     browsed_partner.name) >= 45 and browsed_partner.name[
                                                     0:40] + '...' or browsed_partner.name
@@ -226,7 +211,7 @@ class ReportAgedPartnerBalance(models.AbstractModel):
                 values['name'] = _('Unknown Partner')
                 values['trust'] = False
 
-            if at_least_one_amount or (self._context.get('include_nullified_amount') and lines[partner['partner_id']]):
+            if at_least_one_amount or (self._context.get('include_nullified_amount') and line_counts.get(partner['partner_id'])):
                 res.append(values)
 
         return res, total, lines
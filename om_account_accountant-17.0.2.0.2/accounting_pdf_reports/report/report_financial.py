@@ -1,6 +1,8 @@
 import time
+from collections import defaultdict
 from odoo import api, models, _
 from odoo.exceptions import UserError
+from odoo.tools import float_is_zero
 
 
 class ReportFinancial(models.AbstractModel):
@@ -10,82 +12,182 @@ class ReportFinancial(models.AbstractModel):
     def _compute_account_balance(self, accounts):
         """ compute the balance, debit and credit for the provided accounts
         """
-        mapping = {
-            'balance': "COALESCE(SUM(debit),0) - COALESCE(SUM(credit), 0) as balance",
-            'debit': "COALESCE(SUM(debit), 0) as debit",
-            'credit': "COALESCE(SUM(credit), 0) as credit",
-        }
-
         res = {}
         for account in accounts:
-            res[account.id] = dict.fromkeys(mapping, 0.0)
-        if accounts:
-            tables, where_clause, where_params = self.env['account.move.line']._query_get()
-            tables = tables.replace('"', '') if tables else "account_move_line"
-            wheres = [""]
-            if where_clause.strip():
-                wheres.append(where_clause.strip())
-            filters = " AND ".join(wheres)
-            request = "SELECT account_id as id, " + ', '.join(mapping.values()) + \
-                       " FROM " + tables + \
-                       " WHERE account_id IN %s " \
-                            + filters + \
-                       " GROUP BY account_id"
-            params = (tuple(accounts._ids),) + tuple(where_params)
-            self.env.cr.execute(request, params)
-            for row in self.env.cr.dictfetchall():
-                res[row['id']] = row
+            res[account.id] = dict.fromkeys(['balance', 'debit', 'credit'], 0.0)
+        # answer from the balance snapshots when the filters allow it
+        res.update(self.env['account.balance.snapshot']._compute_account_balances(accounts.ids))
         return res
 
-    def _compute_report_balance(self, reports):
-        '''returns a dictionary with key=the ID of a record and value=the credit, debit and balance amount
-           computed for this record. If the record is of type :
-               'accounts' : it's the sum of the linked accounts
-               'account_type' : it's the sum of leaf accoutns with such an account_type
-               'account_report' : it's the amount of the related report
-               'sum' : it's the sum of the children of this record (aka a 'view' record)'''
-        res = {}
-        fields = ['credit', 'debit', 'balance']
-        for report in reports:
-            if report.id in res:
+    def _get_report_accounts(self, reports):
+        """ Returns a dictionary {report_id: [account_id]} of the 'accounts' and
+            'account_type' nodes reachable from ``reports``, following the
+            children and the linked reports.
+        """
+        report_accounts = {}
+        type_reports = self.env['account.financial.report']
+        todo = list(reports)
+        seen = set()
+        while todo:
+            report = todo.pop()
+            if report.id in seen:
                 continue
-            res[report.id] = dict((fn, 0.0) for fn in fields)
+            seen.add(report.id)
             if report.type == 'accounts':
-                # it's the sum of the linked accounts
-                res[report.id]['account'] = self._compute_account_balance(report.account_ids)
-                for value in res[report.id]['account'].values():
-                    for field in fields:
-                        res[report.id][field] += value.get(field)
+                report_accounts[report.id] = report.account_ids.ids
             elif report.type == 'account_type':
-                # it's the sum the leaf accounts with such an account type
-                accounts = self.env['account.account'].search(
-                    [('account_type', 'in', report.account_type_ids.mapped('type'))])
+                type_reports |= report
+            elif report.type == 'account_report' and report.account_report_id:
+                todo.append(report.account_report_id)
+            elif report.type == 'sum':
+                todo.extend(report.children_ids)
+        if type_reports:
+            # one search for the leaf accounts of all the account types
+            accounts_by_type = defaultdict(list)
+            accounts = self.env['account.account'].search(
+                [('account_type', 'in', type_reports.account_type_ids.mapped('type'))])
+            for account in accounts:
+                accounts_by_type[account.account_type].append(account.id)
+            for report in type_reports:
+                report_accounts[report.id] = [
+                    account_id for account_type in report.account_type_ids.mapped('type')
+                    for account_id in accounts_by_type[account_type]
+                ]
+        return report_accounts
 
-                res[report.id]['account'] = self._compute_account_balance(accounts)
-                for value in res[report.id]['account'].values():
+    def _fold_report_balance(self, reports, report_accounts, balances):
+        """ Folds the account ``balances`` bottom-up through the report tree,
+            each node being evaluated once.
+        """
+        fields = ['credit', 'debit', 'balance']
+        memo = {}
+
+        def evaluate(report):
+            if report.id in memo:
+                return memo[report.id]
+            values = memo[report.id] = dict((fn, 0.0) for fn in fields)
+            if report.type in ('accounts', 'account_type'):
+                # it's the sum of the linked accounts, or of the leaf accounts with such an account type
+                values['account'] = dict(
+                    (account_id, dict(balances[account_id])) for account_id in report_accounts[report.id])
+                for value in values['account'].values():
                     for field in fields:
-                        res[report.id][field] += value.get(field)
+                        values[field] += value.get(field)
             elif report.type == 'account_report' and report.account_report_id:
                 # it's the amount of the linked report
-                res2 = self._compute_report_balance(report.account_report_id)
-                for key, value in res2.items():
-                    for field in fields:
-                        res[report.id][field] += value[field]
+                linked_values = evaluate(report.account_report_id)
+                for field in fields:
+                    values[field] += linked_values[field]
             elif report.type == 'sum':
                 # it's the sum of the children of this account.report
-                res2 = self._compute_report_balance(report.children_ids)
-                for key, value in res2.items():
+                for child in report.children_ids:
+                    child_values = evaluate(child)
                     for field in fields:
-                        res[report.id][field] += value[field]
+                        values[field] += child_values[field]
+            return values
+
+        return dict((report.id, evaluate(report)) for report in reports)
+
+    def _compute_report_balance(self, reports):
+        '''returns a dictionary with key=the ID of a record and value=the credit, debit and balance amount
+           computed for this record. If the record is of type :
+               'accounts' : it's the sum of the linked accounts
+               'account_type' : it's the sum of leaf accoutns with such an account_type
+               'account_report' : it's the amount of the related report
+               'sum' : it's the sum of the children of this record (aka a 'view' record)
+
+           The balances of all the accounts of the tree are computed at once,
+           then folded through the tree.'''
+        report_accounts = self._get_report_accounts(reports)
+        account_ids = set()
+        for ids in report_accounts.values():
+            account_ids.update(ids)
+        balances = self._compute_account_balance(self.env['account.account'].browse(account_ids))
+        return self._fold_report_balance(reports, report_accounts, balances)
+
+    def _compute_account_balance_periods(self, accounts, periods):
+        """ compute the balance, debit and credit of the provided accounts for
+            each of the consecutive ``periods`` ({'date_from', 'date_to'}) in
+            one aggregation grouped by account and period. The accounts
+            including their initial balance (balance sheet) get their closing
+            balance, the others their movements of the period.
+
+            Returns a list of dictionaries {account_id: values}, one per period.
+        """
+        fields = ['balance', 'debit', 'credit']
+        res = [dict((account.id, dict.fromkeys(fields, 0.0)) for account in accounts) for period in periods]
+        if not accounts or not periods:
+            return res
+        tables, where_clause, where_params = self.env['account.move.line'].with_context(
+            date_from=periods[0]['date_from'], date_to=periods[-1]['date_to'], strict_range=False)._query_get()
+        tables = tables.replace('"', '') if tables else "account_move_line"
+        wheres = [""]
+        if where_clause.strip():
+            wheres.append(where_clause.strip())
+        filters = " AND ".join(wheres)
+        # lines prior to the first period (initial balances) fall in the first one
+        bucket = "CASE"
+        for index in range(len(periods) - 1):
+            bucket += ' WHEN "account_move_line".date <= %s THEN ' + str(index)
+        bucket += " ELSE " + str(len(periods) - 1) + " END"
+        request = "SELECT account_id AS id, " + bucket + " AS period, " \
+                  "COALESCE(SUM(debit), 0) AS debit, COALESCE(SUM(credit), 0) AS credit" + \
+                  " FROM " + tables + \
+                  " WHERE account_id IN %s " + filters + \
+                  " GROUP BY account_id, period"
+        params = tuple(period['date_to'] for period in periods[:-1]) + (tuple(accounts._ids),) + tuple(where_params)
+        self.env.cr.execute(request, params)
+        for row in self.env.cr.dictfetchall():
+            values = res[row['period']][row['id']]
+            values['debit'] = row['debit']
+            values['credit'] = row['credit']
+            values['balance'] = row['debit'] - row['credit']
+        # closing balances of the balance sheet accounts
+        for account in accounts.filtered('include_initial_balance'):
+            for index in range(1, len(periods)):
+                for field in fields:
+                    res[index][account.id][field] += res[index - 1][account.id][field]
         return res
 
+    def _compute_report_balance_periods(self, reports, periods):
+        """ Same as :meth:`_compute_report_balance` for each of the ``periods``,
+            from a single balance aggregation.
+        """
+        report_accounts = self._get_report_accounts(reports)
+        account_ids = set()
+        for ids in report_accounts.values():
+            account_ids.update(ids)
+        balances = self._compute_account_balance_periods(self.env['account.account'].browse(account_ids), periods)
+        return [self._fold_report_balance(reports, report_accounts, period_balances) for period_balances in balances]
+
+    def _get_account_details(self, account_ids):
+        """ Returns a dictionary {account_id: {'name', 'account_type', 'rounding'}}
+            of the accounts displayed in the details, read in one go.
+        """
+        accounts = self.env['account.account'].browse(account_ids)
+        rows = accounts.read(['code', 'name', 'account_type', 'company_id'], load=None)
+        companies = self.env['res.company'].browse(set(row['company_id'] for row in rows))
+        roundings = dict((company.id, company.currency_id.rounding) for company in companies)
+        return dict((row['id'], {
+            'name': row['code'] + ' ' + row['name'],
+            'account_type': row['account_type'],
+            'rounding': roundings[row['company_id']],
+        }) for row in rows)
+
     def get_account_lines(self, data):
         lines = []
         account_report = self.env['account.financial.report'].search(
             [('id', '=', data['account_report_id'][0])])
         child_reports = account_report._get_children_by_order()
-        res = self.with_context(data.get('used_context'))._compute_report_balance(child_reports)
-        if data['enable_filter']:
+        periods = data.get('periods')
+        if periods:
+            # one column per period, the last one is used as balance
+            res_periods = self.with_context(data.get('used_context'))._compute_report_balance_periods(
+                child_reports, periods)
+            res = res_periods[-1]
+        else:
+            res = self.with_context(data.get('used_context'))._compute_report_balance(child_reports)
+        if data['enable_filter'] and not periods:
             comparison_res = self.with_context(
                 data.get('comparison_context'))._compute_report_balance(
                 child_reports)
@@ -95,6 +197,14 @@ class ReportFinancial(models.AbstractModel):
                 if report_acc:
                     for account_id, val in comparison_res[report_id].get('account').items():
                         report_acc[account_id]['comp_bal'] = val['balance']
+        # the details of all the displayed accounts, read at once and sorted by name
+        detail_ids = set()
+        for report in child_reports:
+            if report.display_detail != 'no_detail' and res[report.id].get('account'):
+                detail_ids.update(res[report.id]['account'])
+        details = self._get_account_details(list(detail_ids))
+        details_rank = dict((account_id, rank) for rank, account_id in enumerate(
+            sorted(details, key=lambda account_id: details[account_id]['name'])))
         for report in child_reports:
             vals = {
                 'name': report.name,
@@ -107,42 +217,50 @@ class ReportFinancial(models.AbstractModel):
                 vals['debit'] = res[report.id]['debit']
                 vals['credit'] = res[report.id]['credit']
 
-            if data['enable_filter']:
+            if data['enable_filter'] and not periods:
                 vals['balance_cmp'] = res[report.id]['comp_bal'] * float(report.sign)
+            if periods:
+                vals['balance_periods'] = [
+                    res_period[report.id]['balance'] * float(report.sign) for res_period in res_periods]
 
             lines.append(vals)
             if report.display_detail == 'no_detail':
                 #the rest of the loop is used to display the details of the financial report, so it's not needed here.
                 continue
             if res[report.id].get('account'):
+                #if there are accounts to display, we add them to the lines with a level equals to their level in
+                #the COA + 1 (to avoid having them with a too low level that would conflicts with the level of data
+                #financial reports for Assets, liabilities...)
+                level = report.display_detail == 'detail_with_hierarchy' and 4
+                sign = float(report.sign)
                 sub_lines = []
-                for account_id, value in res[report.id]['account'].items():
-                    #if there are accounts to display, we add them to the lines with a level equals to their level in
-                    #the COA + 1 (to avoid having them with a too low level that would conflicts with the level of data
-                    #financial reports for Assets, liabilities...)
-                    flag = False
-                    account = self.env['account.account'].browse(account_id)
+                for account_id in sorted(res[report.id]['account'], key=details_rank.get):
+                    value = res[report.id]['account'][account_id]
+                    detail = details[account_id]
+                    rounding = detail['rounding']
                     vals = {
-                        'name': account.code + ' ' + account.name,
-                        'balance': value['balance'] * float(report.sign) or 0.0,
+                        'name': detail['name'],
+                        'balance': value['balance'] * sign or 0.0,
                         'type': 'account',
-                        'level': report.display_detail == 'detail_with_hierarchy' and 4,
-                        'account_type': account.account_type,
+                        'level': level,
+                        'account_type': detail['account_type'],
                     }
+                    amounts = [vals['balance']]
                     if data['debit_credit']:
                         vals['debit'] = value['debit']
                         vals['credit'] = value['credit']
-                        if not account.company_id.currency_id.is_zero(vals['debit']) or not account.company_id.currency_id.is_zero(vals['credit']):
-                            flag = True
-                    if not account.company_id.currency_id.is_zero(vals['balance']):
-                        flag = True
-                    if data['enable_filter']:
-                        vals['balance_cmp'] = value['comp_bal'] * float(report.sign)
-                        if not account.company_id.currency_id.is_zero(vals['balance_cmp']):
-                            flag = True
-                    if flag:
+                        amounts += [vals['debit'], vals['credit']]
+                    if data['enable_filter'] and not periods:
+                        vals['balance_cmp'] = value['comp_bal'] * sign
+                        amounts.append(vals['balance_cmp'])
+                    if periods:
+                        vals['balance_periods'] = [
+                            res_period[report.id]['account'][account_id]['balance'] * sign or 0.0
+                            for res_period in res_periods]
+                        amounts += vals['balance_periods']
+                    if not all(float_is_zero(amount, precision_rounding=rounding) for amount in amounts):
                         sub_lines.append(vals)
-                lines += sorted(sub_lines, key=lambda sub_line: sub_line['name'])
+                lines += sub_lines
         return lines
 
     @api.model
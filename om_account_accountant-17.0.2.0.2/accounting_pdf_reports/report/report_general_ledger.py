@@ -1,139 +1,136 @@
+import io
+import logging
+import math
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
 from odoo import api, models, _
 from odoo.exceptions import UserError
+from odoo.tools.pdf import PdfFileReader, PdfFileWriter, merge_pdf
+
+_logger = logging.getLogger(__name__)
+
+# smallest number of accounts rendered by a worker of the parallel mode
+PARALLEL_MIN_SHARD_SIZE = 50
 
 
 class ReportGeneralLedger(models.AbstractModel):
     _name = 'report.accounting_pdf_reports.report_general_ledger'
+    _inherit = 'account.report.ledger'
     _description = 'General Ledger Report'
 
-    def _get_account_move_entry(self, accounts, analytic_account_ids,
-                                partner_ids, init_balance,
-                                sortby, display_account):
-        """
-        :param:
-                accounts: the recordset of accounts
-                analytic_account_ids: the recordset of analytic accounts
-                init_balance: boolean value of initial_balance
-                sortby: sorting by date or partner and journal
-                display_account: type of account(receivable, payable and both)
+    def _get_accounts(self, data, docs):
+        """ Returns the accounts printed in the report """
+        if self.env.context.get('general_ledger_account_ids'):
+            # shard of the parallel mode
+            return self.env['account.account'].browse(self.env.context['general_ledger_account_ids'])
+        if docs._name == 'account.account':
+            return docs
+        domain = []
+        if data['form'].get('account_ids', False):
+            domain.append(('id', 'in', data['form']['account_ids']))
+        return self.env['account.account'].search(domain)
 
-        Returns a dictionary of accounts with following key and value {
-                'code': account code,
-                'name': account name,
-                'debit': sum of total debit amount,
-                'credit': sum of total credit amount,
-                'balance': total balance,
-                'amount_currency': sum of amount_currency,
-                'move_lines': list of move line
-        }
+    def _get_parallel_shards(self, data):
+        """ Returns the lists of account ids rendered by each worker of the
+            parallel mode, or None when the report is rendered serially.
         """
-        cr = self.env.cr
-        MoveLine = self.env['account.move.line']
-        move_lines = {x: [] for x in accounts.ids}
-
-        # Prepare initial sql query and Get the initial move lines
-        if init_balance:
-            context = dict(self.env.context)
-            context['date_from'] = self.env.context.get('date_from')
-            context['date_to'] = False
-            context['initial_bal'] = True
-            if analytic_account_ids:
-                context['analytic_account_ids'] = analytic_account_ids
-            if partner_ids:
-                context['partner_ids'] = partner_ids
-            init_tables, init_where_clause, init_where_params = MoveLine.with_context(context)._query_get()
-            init_wheres = [""]
-            if init_where_clause.strip():
-                init_wheres.append(init_where_clause.strip())
-            init_filters = " AND ".join(init_wheres)
-            filters = init_filters.replace('account_move_line__move_id', 'm').replace('account_move_line', 'l')
-            sql = ("""SELECT 0 AS lid, l.account_id AS account_id, '' AS ldate,
-                '' AS lcode, 0.0 AS amount_currency, 
-                '' AS analytic_account_id, '' AS lref, 
-                'Initial Balance' AS lname, COALESCE(SUM(l.debit),0.0) AS debit, 
-                COALESCE(SUM(l.credit),0.0) AS credit, 
-                COALESCE(SUM(l.debit),0) - COALESCE(SUM(l.credit), 0) as balance, 
-                '' AS lpartner_id,\
-                '' AS move_name, '' AS move_id, '' AS currency_code,\
-                NULL AS currency_id,\
-                '' AS invoice_id, '' AS invoice_type, '' AS invoice_number,\
-                '' AS partner_name\
-                FROM account_move_line l\
-                LEFT JOIN account_move m ON (l.move_id=m.id)\
-                LEFT JOIN res_currency c ON (l.currency_id=c.id)\
-                LEFT JOIN res_partner p ON (l.partner_id=p.id)\
-                JOIN account_journal j ON (l.journal_id=j.id)\
-                WHERE l.account_id IN %s""" + filters + ' GROUP BY l.account_id')
-            params = (tuple(accounts.ids),) + tuple(init_where_params)
-            cr.execute(sql, params)
-            for row in cr.dictfetchall():
-                move_lines[row.pop('account_id')].append(row)
+        workers = int(self.env['ir.config_parameter'].sudo().get_param(
+            'accounting_pdf_reports.general_ledger_workers', 0))
+        if workers < 2 or self.env.context.get('general_ledger_account_ids'):
+            return None
+        model = self.env.context.get('active_model')
+        docs = self.env[model].browse(self.env.context.get('active_ids', []))
+        account_ids = self._get_accounts(data, docs).ids
+        shard_size = max(PARALLEL_MIN_SHARD_SIZE, math.ceil(len(account_ids) / workers))
+        if len(account_ids) <= shard_size:
+            return None
+        return [account_ids[i:i + shard_size] for i in range(0, len(account_ids), shard_size)]
 
-        sql_sort = 'l.date, l.move_id'
-        if sortby == 'sort_journal_partner':
-            sql_sort = 'j.code, p.name, l.move_id'
+    def _render_shard(self, report_ref, res_ids, data, shard_index, account_ids, snapshot_id, profile=None):
+        """ Renders the accounts of a shard in its own transaction, on the
+            snapshot exported by the main one. Its queries are added to the
+            ``profile`` of the report run, if any.
+        """
+        thread = threading.current_thread()
+        # as in the request threads, for the logs and the profiler
+        thread.dbname = self.env.cr.dbname
+        thread.uid = self.env.uid
+        try:
+            with profile.attach() if profile else nullcontext(), self.pool.cursor() as cr:
+                cr.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cr.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+                context = dict(self.env.context, general_ledger_account_ids=account_ids,
+                               general_ledger_shard=shard_index)
+                env = api.Environment(cr, self.env.uid, context, su=self.env.su)
+                content, report_type = env['ir.actions.report']._render_qweb_pdf(report_ref, res_ids, data=data)
+                return content
+        finally:
+            del thread.dbname
+            del thread.uid
 
-        # Prepare sql query base on selected parameters from wizard
-        context = dict(self.env.context)
-        if analytic_account_ids:
-            context['analytic_account_ids'] = analytic_account_ids
-        if partner_ids:
-            context['partner_ids'] = partner_ids
-        tables, where_clause, where_params = MoveLine.with_context(context)._query_get()
-        wheres = [""]
-        if where_clause.strip():
-            wheres.append(where_clause.strip())
-        filters = " AND ".join(wheres)
-        filters = filters.replace('account_move_line__move_id', 'm').replace('account_move_line', 'l')
+    @api.model
+    def _number_pages(self, content):
+        """ Stamps 'page / total' on the pages of the merged shards, where
+            the internal layout prints it.
+        """
+        reader = PdfFileReader(io.BytesIO(content), strict=False)
+        page_count = reader.getNumPages()
+        packet = io.BytesIO()
+        stamps = canvas.Canvas(packet)
+        for index in range(page_count):
+            page = reader.getPage(index)
+            width = float(abs(page.mediaBox.getWidth()))
+            height = float(abs(page.mediaBox.getHeight()))
+            stamps.setPageSize((width, height))
+            stamps.setFont('Helvetica', 9)
+            stamps.drawRightString(width - 7 * mm, height - 9 * mm, '%s / %s' % (index + 1, page_count))
+            stamps.showPage()
+        stamps.save()
+        stamp_reader = PdfFileReader(packet, strict=False)
+        writer = PdfFileWriter()
+        for index in range(page_count):
+            page = reader.getPage(index)
+            page.mergePage(stamp_reader.getPage(index))
+            writer.addPage(page)
+        result = io.BytesIO()
+        writer.write(result)
+        return result.getvalue()
 
-        # Get move lines base on sql query and Calculate the total balance of move lines
-        sql = ('''SELECT l.id AS lid, l.account_id AS account_id, 
-            l.date AS ldate, j.code AS lcode, l.currency_id, 
-            l.amount_currency, '' AS analytic_account_id,
-            l.ref AS lref, l.name AS lname, COALESCE(l.debit,0) AS debit, 
-            COALESCE(l.credit,0) AS credit, 
-            COALESCE(SUM(l.debit),0) - COALESCE(SUM(l.credit), 0) AS balance,\
-            m.name AS move_name, c.symbol AS currency_code, 
-            p.name AS partner_name\
-            FROM account_move_line l\
-            JOIN account_move m ON (l.move_id=m.id)\
-            LEFT JOIN res_currency c ON (l.currency_id=c.id)\
-            LEFT JOIN res_partner p ON (l.partner_id=p.id)\
-            JOIN account_journal j ON (l.journal_id=j.id)\
-            JOIN account_account acc ON (l.account_id = acc.id) \
-            WHERE l.account_id IN %s ''' + filters + ''' GROUP BY l.id, 
-            l.account_id, l.date, j.code, l.currency_id, l.amount_currency, 
-            l.ref, l.name, m.name, c.symbol, p.name ORDER BY ''' + sql_sort)
-        params = (tuple(accounts.ids),) + tuple(where_params)
-        cr.execute(sql, params)
+    @api.model
+    def _render_parallel_pdf(self, report_ref, res_ids, data):
+        """ Parallel mode of the report, enabled by the
+            ``accounting_pdf_reports.general_ledger_workers`` parameter.
 
-        for row in cr.dictfetchall():
-            balance = 0
-            for line in move_lines.get(row['account_id']):
-                balance += line['debit'] - line['credit']
-            row['balance'] += balance
-            move_lines[row.pop('account_id')].append(row)
+            The accounts are split in shards rendered by a pool of workers,
+            each one with its own database connection importing the snapshot
+            of the current transaction, and the PDF of the shards are merged
+            in the order of the accounts, then numbered. The filters and
+            titles are only printed by the first shard.
 
-        # Calculate the debit, credit and balance for Accounts
-        account_res = []
-        for account in accounts:
-            currency = account.currency_id and account.currency_id or account.company_id.currency_id
-            res = dict((fn, 0.0) for fn in ['credit', 'debit', 'balance'])
-            res['code'] = account.code
-            res['name'] = account.name
-            res['move_lines'] = move_lines[account.id]
-            for line in res.get('move_lines'):
-                res['debit'] += line['debit']
-                res['credit'] += line['credit']
-                res['balance'] = line['balance']
-            if display_account == 'all':
-                account_res.append(res)
-            if display_account == 'movement' and res.get('move_lines'):
-                account_res.append(res)
-            if display_account == 'not_zero' and not currency.is_zero(res['balance']):
-                account_res.append(res)
-        return account_res
+            The shards read the data committed when the snapshot is exported:
+            like any concurrent transaction, they do not see what the current
+            transaction has written and not committed yet. Returns None when
+            the report is too small to be split.
+        """
+        shards = self._get_parallel_shards(data)
+        if not shards:
+            return None
+        self.env.cr.execute("SELECT pg_export_snapshot()")
+        snapshot_id = self.env.cr.fetchone()[0]
+        profile = self.env['ir.actions.report']._get_report_profile()
+        _logger.info("Rendering the general ledger in %s shards", len(shards))
+        with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+            contents = list(executor.map(
+                lambda shard: self._render_shard(report_ref, res_ids, data, shard[0], shard[1], snapshot_id,
+                                                 profile=profile),
+                enumerate(shards)))
+        return self._number_pages(merge_pdf(contents))
 
     @api.model
     def _get_report_values(self, docids, data=None):
@@ -157,15 +154,8 @@ class ReportGeneralLedger(models.AbstractModel):
         if data['form'].get('partner_ids', False):
             partner_ids = self.env['res.partner'].search(
                 [('id', 'in', data['form']['partner_ids'])])
-        if model == 'account.account':
-            accounts = docs
-        else:
-            domain = []
-            if data['form'].get('account_ids', False):
-                domain.append(('id', 'in', data['form']['account_ids']))
-            accounts = self.env['account.account'].search(domain)
-        accounts_res = self.with_context(
-            data['form'].get('used_context', {}))._get_account_move_entry(
+        accounts = self._get_accounts(data, docs)
+        accounts_res = self._with_report_context(data['form'].get('used_context', {}))._get_ledger_entries(
             accounts,
             analytic_account_ids,
             partner_ids,
@@ -181,4 +171,5 @@ class ReportGeneralLedger(models.AbstractModel):
             'accounts': accounts,
             'partner_ids': partner_ids,
             'analytic_account_ids': analytic_account_ids,
+            'ledger_shard': self.env.context.get('general_ledger_shard'),
         }
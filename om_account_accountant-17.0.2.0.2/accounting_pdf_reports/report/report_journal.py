@@ -1,13 +1,23 @@
 import time
+from collections import namedtuple
 from odoo import api, models, _
 from odoo.exceptions import UserError
 
+# journal item row of the report
+JournalLine = namedtuple('JournalLine', [
+    'move_name', 'move_id', 'date', 'account_code', 'partner_name', 'name',
+    'debit', 'credit', 'amount_currency', 'currency_id',
+])
+
 
 class ReportJournal(models.AbstractModel):
     _name = 'report.accounting_pdf_reports.report_journal'
     _description = 'Journal Audit Report'
 
     def lines(self, target_move, journal_ids, sort_selection, data):
+        """ Returns the journal items of the journals as :class:`JournalLine`
+            tuples, read with plain SQL instead of being browsed.
+        """
         if isinstance(journal_ids, int):
             journal_ids = [journal_ids]
 
@@ -17,73 +27,92 @@ class ReportJournal(models.AbstractModel):
 
         query_get_clause = self._get_query_get_clause(data)
         params = [tuple(move_state), tuple(journal_ids)] + query_get_clause[2]
-        query = 'SELECT "account_move_line".id FROM ' + query_get_clause[0] + ', account_move am, account_account acc WHERE "account_move_line".account_id = acc.id AND "account_move_line".move_id=am.id AND am.state IN %s AND "account_move_line".journal_id IN %s AND ' + query_get_clause[1] + ' ORDER BY '
+        query = 'SELECT am.name, am.id, "account_move_line".date, acc.code, p.name, "account_move_line".name, ' \
+                '"account_move_line".debit, "account_move_line".credit, "account_move_line".amount_currency, ' \
+                '"account_move_line".currency_id ' \
+                'FROM ' + query_get_clause[0] + ' JOIN account_move am ON ("account_move_line".move_id = am.id) ' \
+                'JOIN account_account acc ON ("account_move_line".account_id = acc.id) ' \
+                'LEFT JOIN res_partner p ON ("account_move_line".partner_id = p.id) ' \
+                'WHERE am.state IN %s AND "account_move_line".journal_id IN %s AND ' + query_get_clause[1] + ' ORDER BY '
         if sort_selection == 'date':
             query += '"account_move_line".date'
         else:
             query += 'am.name'
         query += ', "account_move_line".move_id, acc.code'
         self.env.cr.execute(query, tuple(params))
-        ids = (x[0] for x in self.env.cr.fetchall())
-        return self.env['account.move.line'].browse(ids)
-
-    def _sum_debit(self, data, journal_id):
+        currency = self.env['res.currency']
+        return [JournalLine(*(row[:-1] + (currency.browse(row[-1]),))) for row in self.env.cr.fetchall()]
+
+    def _get_journal_amounts(self, data):
+        """ Returns a dictionary {journal_id: {'debit', 'credit', 'taxes'}} where
+            'taxes' is {tax_id: {'base_amount', 'tax_amount'}}, computed for all
+            the printed journals with one grouped aggregation.
+        """
+        computed = data.setdefault('computed', {})
+        if 'journal_amounts' in computed:
+            return computed['journal_amounts']
         move_state = ['draft', 'posted']
         if data['form'].get('target_move', 'all') == 'posted':
             move_state = ['posted']
+        journal_ids = data['form']['journal_ids']
+        amounts = dict((journal_id, {'debit': 0.0, 'credit': 0.0, 'taxes': {}}) for journal_id in journal_ids)
+        computed['journal_amounts'] = amounts
+        if not journal_ids:
+            return amounts
 
         query_get_clause = self._get_query_get_clause(data)
-        params = [tuple(move_state), tuple(journal_id.ids)] + query_get_clause[2]
-        self.env.cr.execute('SELECT SUM(debit) FROM ' + query_get_clause[0] + ', account_move am '
-                        'WHERE "account_move_line".move_id=am.id AND am.state IN %s AND "account_move_line".journal_id IN %s AND ' + query_get_clause[1] + ' ',
-                        tuple(params))
-        return self.env.cr.fetchone()[0] or 0.0
+        tables, where_clause = query_get_clause[0], query_get_clause[1]
+        filters = 'am.state IN %s AND "account_move_line".journal_id IN %s AND ' + where_clause
+        params = [tuple(move_state), tuple(journal_ids)] + query_get_clause[2]
+        query = """
+            SELECT 'total' AS kind, "account_move_line".journal_id, NULL::integer AS tax_id,
+                   SUM("account_move_line".debit), SUM("account_move_line".credit)
+            FROM """ + tables + """
+            JOIN account_move am ON ("account_move_line".move_id = am.id)
+            WHERE """ + filters + """
+            GROUP BY "account_move_line".journal_id
+            UNION ALL
+            SELECT 'base', "account_move_line".journal_id, rel.account_tax_id,
+                   SUM("account_move_line".balance), NULL
+            FROM """ + tables + """
+            JOIN account_move am ON ("account_move_line".move_id = am.id)
+            JOIN account_move_line_account_tax_rel rel ON ("account_move_line".id = rel.account_move_line_id)
+            WHERE """ + filters + """
+            GROUP BY "account_move_line".journal_id, rel.account_tax_id
+            UNION ALL
+            SELECT 'tax', "account_move_line".journal_id, "account_move_line".tax_line_id,
+                   SUM("account_move_line".debit - "account_move_line".credit), NULL
+            FROM """ + tables + """
+            JOIN account_move am ON ("account_move_line".move_id = am.id)
+            WHERE """ + filters + """ AND "account_move_line".tax_line_id IS NOT NULL
+            GROUP BY "account_move_line".journal_id, "account_move_line".tax_line_id"""
+        self.env.cr.execute(query, tuple(params * 3))
+        tax_amounts = {}
+        for kind, journal_id, tax_id, amount, credit in self.env.cr.fetchall():
+            if kind == 'total':
+                amounts[journal_id]['debit'] = amount or 0.0
+                amounts[journal_id]['credit'] = credit or 0.0
+            elif kind == 'base':
+                amounts[journal_id]['taxes'][tax_id] = {'base_amount': amount, 'tax_amount': 0.0}
+            else:
+                tax_amounts[(journal_id, tax_id)] = amount or 0.0
+        # only the taxes having a base are declared
+        for journal_id, values in amounts.items():
+            for tax_id, tax_values in values['taxes'].items():
+                tax_values['tax_amount'] = tax_amounts.get((journal_id, tax_id), 0.0)
+        return amounts
 
-    def _sum_credit(self, data, journal_id):
-        move_state = ['draft', 'posted']
-        if data['form'].get('target_move', 'all') == 'posted':
-            move_state = ['posted']
+    def _sum_debit(self, data, journal_id):
+        return self._get_journal_amounts(data)[journal_id.id]['debit']
 
-        query_get_clause = self._get_query_get_clause(data)
-        params = [tuple(move_state), tuple(journal_id.ids)] + query_get_clause[2]
-        self.env.cr.execute('SELECT SUM(credit) FROM ' + query_get_clause[0] + ', account_move am '
-                        'WHERE "account_move_line".move_id=am.id AND am.state IN %s AND "account_move_line".journal_id IN %s AND ' + query_get_clause[1] + ' ',
-                        tuple(params))
-        return self.env.cr.fetchone()[0] or 0.0
+    def _sum_credit(self, data, journal_id):
+        return self._get_journal_amounts(data)[journal_id.id]['credit']
 
     def _get_taxes(self, data, journal_id):
-        move_state = ['draft', 'posted']
-        if data['form'].get('target_move', 'all') == 'posted':
-            move_state = ['posted']
-
-        query_get_clause = self._get_query_get_clause(data)
-        params = [tuple(move_state), tuple(journal_id.ids)] + query_get_clause[2]
-        query = """
-            SELECT rel.account_tax_id, SUM("account_move_line".balance) AS base_amount
-            FROM account_move_line_account_tax_rel rel, """ + query_get_clause[0] + """ 
-            LEFT JOIN account_move am ON "account_move_line".move_id = am.id
-            WHERE "account_move_line".id = rel.account_move_line_id
-                AND am.state IN %s
-                AND "account_move_line".journal_id IN %s
-                AND """ + query_get_clause[1] + """
-           GROUP BY rel.account_tax_id"""
-        self.env.cr.execute(query, tuple(params))
-        ids = []
-        base_amounts = {}
-        for row in self.env.cr.fetchall():
-            ids.append(row[0])
-            base_amounts[row[0]] = row[1]
-
-
+        taxes = self._get_journal_amounts(data)[journal_id.id]['taxes']
         res = {}
-        for tax in self.env['account.tax'].browse(ids):
-            self.env.cr.execute('SELECT sum(debit - credit) FROM ' + query_get_clause[0] + ', account_move am '
-                'WHERE "account_move_line".move_id=am.id AND am.state IN %s AND "account_move_line".journal_id IN %s AND ' + query_get_clause[1] + ' AND tax_line_id = %s',
-                tuple(params + [tax.id]))
-            res[tax] = {
-                'base_amount': base_amounts[tax.id],
-                'tax_amount': self.env.cr.fetchone()[0] or 0.0,
-            }
+        for tax in self.env['account.tax'].browse(list(taxes)):
+            res[tax] = dict(taxes[tax.id])
             if journal_id.type == 'sale':
                 #sales operation are credits
                 res[tax]['base_amount'] = res[tax]['base_amount'] * -1
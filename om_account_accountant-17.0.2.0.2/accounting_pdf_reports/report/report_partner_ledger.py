@@ -7,63 +7,62 @@ class ReportPartnerLedger(models.AbstractModel):
     _name = 'report.accounting_pdf_reports.report_partnerledger'
     _description = 'Partner Ledger Report'
 
-    def _lines(self, data, partner):
-        full_account = []
+    def _compute_partner_ledger(self, data, partner_ids):
+        """ Fetches the lines of all the given partners in one ordered scan and
+            computes their sums and progressive balance in a single pass.
+
+            Returns a dictionary {partner_id: {'lines': [...], 'debit': ...,
+            'credit': ..., 'debit - credit': ...}}
+        """
+        ledger = {
+            partner_id: {'lines': [], 'debit': 0.0, 'credit': 0.0, 'debit - credit': 0.0}
+            for partner_id in partner_ids
+        }
+        if not partner_ids:
+            return ledger
         currency = self.env['res.currency']
         query_get_data = self.env['account.move.line'].with_context(data['form'].get('used_context', {}))._query_get()
         reconcile_clause = "" if data['form']['reconciled'] else ' AND "account_move_line".full_reconcile_id IS NULL '
-        params = [partner.id, tuple(data['computed']['move_state']), tuple(data['computed']['account_ids'])] + query_get_data[2]
+        params = [tuple(partner_ids), tuple(data['computed']['move_state']), tuple(data['computed']['account_ids'])] + query_get_data[2]
         query = """
-            SELECT "account_move_line".id, "account_move_line".date, j.code, acc.code as a_code, acc.name as a_name, "account_move_line".ref, m.name as move_name, "account_move_line".name, "account_move_line".debit, "account_move_line".credit, "account_move_line".amount_currency,"account_move_line".currency_id, c.symbol AS currency_code
+            SELECT "account_move_line".id, "account_move_line".partner_id, "account_move_line".date, j.code, acc.code as a_code, acc.name as a_name, "account_move_line".ref, m.name as move_name, "account_move_line".name, "account_move_line".debit, "account_move_line".credit, "account_move_line".amount_currency,"account_move_line".currency_id, c.symbol AS currency_code
             FROM """ + query_get_data[0] + """
             LEFT JOIN account_journal j ON ("account_move_line".journal_id = j.id)
             LEFT JOIN account_account acc ON ("account_move_line".account_id = acc.id)
             LEFT JOIN res_currency c ON ("account_move_line".currency_id=c.id)
             LEFT JOIN account_move m ON (m.id="account_move_line".move_id)
-            WHERE "account_move_line".partner_id = %s
+            WHERE "account_move_line".partner_id IN %s
                 AND m.state IN %s
                 AND "account_move_line".account_id IN %s AND """ + query_get_data[1] + reconcile_clause + """
-                ORDER BY "account_move_line".date"""
+                ORDER BY "account_move_line".partner_id, "account_move_line".date, "account_move_line".id"""
         self.env.cr.execute(query, tuple(params))
-        res = self.env.cr.dictfetchall()
-        sum = 0.0
-        lang_code = self.env.context.get('lang') or 'en_US'
-        lang = self.env['res.lang']
-        lang_id = lang._lang_get(lang_code)
-        date_format = lang_id.date_format
-        for r in res:
-            r['date'] = r['date']
+        for r in self.env.cr.dictfetchall():
+            partner_ledger = ledger[r.pop('partner_id')]
             r['displayed_name'] = '-'.join(
                 r[field_name] for field_name in ('move_name', 'ref', 'name')
                 if r[field_name] not in (None, '', '/')
             )
-            sum += r['debit'] - r['credit']
-            r['progress'] = sum
+            partner_ledger['debit'] += r['debit']
+            partner_ledger['credit'] += r['credit']
+            partner_ledger['debit - credit'] += r['debit'] - r['credit']
+            r['progress'] = partner_ledger['debit - credit']
             r['currency_id'] = currency.browse(r.get('currency_id'))
-            full_account.append(r)
-        return full_account
+            partner_ledger['lines'].append(r)
+        return ledger
+
+    def _get_partner_ledger(self, data, partner):
+        ledger = data['computed'].setdefault('ledger', {})
+        if partner.id not in ledger:
+            ledger.update(self._compute_partner_ledger(data, partner.ids))
+        return ledger[partner.id]
+
+    def _lines(self, data, partner):
+        return self._get_partner_ledger(data, partner)['lines']
 
     def _sum_partner(self, data, partner, field):
         if field not in ['debit', 'credit', 'debit - credit']:
             return
-        result = 0.0
-        query_get_data = self.env['account.move.line'].with_context(data['form'].get('used_context', {}))._query_get()
-        reconcile_clause = "" if data['form']['reconciled'] else ' AND "account_move_line".full_reconcile_id IS NULL '
-
-        params = [partner.id, tuple(data['computed']['move_state']), tuple(data['computed']['account_ids'])] + query_get_data[2]
-        query = """SELECT sum(""" + field + """)
-                FROM """ + query_get_data[0] + """, account_move AS m
-                WHERE "account_move_line".partner_id = %s
-                    AND m.id = "account_move_line".move_id
-                    AND m.state IN %s
-                    AND account_id IN %s
-                    AND """ + query_get_data[1] + reconcile_clause
-        self.env.cr.execute(query, tuple(params))
-
-        contemp = self.env.cr.fetchone()
-        if contemp is not None:
-            result = contemp[0] or 0.0
-        return result
+        return self._get_partner_ledger(data, partner)[field]
 
     @api.model
     def _get_report_values(self, docids, data=None):
@@ -110,6 +109,7 @@ class ReportPartnerLedger(models.AbstractModel):
                            self.env.cr.dictfetchall()]
         partners = obj_partner.browse(partner_ids)
         partners = sorted(partners, key=lambda x: (x.ref or '', x.name or ''))
+        data['computed']['ledger'] = self._compute_partner_ledger(data, partner_ids)
 
         return {
             'doc_ids': partner_ids,
@@ -15,56 +15,95 @@ class ReportTax(models.AbstractModel):
             'lines': self.get_lines(data.get('form')),
         }
 
-    def _sql_from_amls_one(self):
-        sql = """SELECT "account_move_line".tax_line_id, COALESCE(SUM("account_move_line".debit-"account_move_line".credit), 0)
-                    FROM %s
-                    WHERE %s GROUP BY "account_move_line".tax_line_id"""
-        return sql
+    def _get_date_ranges(self, options):
+        """ Returns the date ranges ({'name', 'date_from', 'date_to'}) of the
+            report, the range of the wizard coming first.
+        """
+        return options.get('date_ranges') or [{
+            'name': '%s - %s' % (options['date_from'], options['date_to']),
+            'date_from': options['date_from'],
+            'date_to': options['date_to'],
+        }]
 
-    def _sql_from_amls_two(self):
-        sql = """SELECT r.account_tax_id, COALESCE(SUM("account_move_line".debit-"account_move_line".credit), 0)
-                 FROM %s
-                 INNER JOIN account_move_line_account_tax_rel r ON ("account_move_line".id = r.account_move_line_id)
-                 INNER JOIN account_tax t ON (r.account_tax_id = t.id)
-                 WHERE %s GROUP BY r.account_tax_id"""
+    def _sql_from_amls(self, tables, where_clause, date_ranges):
+        """ Scans the journal items once: each item is matched to the date
+            ranges it falls in, and expanded into its tax amount (tax_line_id)
+            and its base amounts (one per tax of the relation table).
+        """
+        periods = ', '.join(['(%s, %s::date, %s::date)'] * len(date_ranges))
+        sql = """WITH p(period, date_from, date_to) AS (VALUES """ + periods + """)
+                 SELECT p.period, t.tax_id, COALESCE(SUM(t.tax), 0), COALESCE(SUM(t.net), 0)
+                 FROM """ + tables + """
+                 CROSS JOIN LATERAL (
+                    SELECT "account_move_line".tax_line_id AS tax_id,
+                           "account_move_line".debit - "account_move_line".credit AS tax,
+                           0.0 AS net
+                    WHERE "account_move_line".tax_line_id IS NOT NULL
+                    UNION ALL
+                    SELECT r.account_tax_id,
+                           0.0,
+                           "account_move_line".debit - "account_move_line".credit
+                    FROM account_move_line_account_tax_rel r
+                    WHERE r.account_move_line_id = "account_move_line".id
+                 ) t
+                 INNER JOIN p ON ("account_move_line".date BETWEEN p.date_from AND p.date_to)
+                 WHERE """ + where_clause + """ AND t.tax_id IN %s
+                 GROUP BY p.period, t.tax_id"""
         return sql
 
-    def _compute_from_amls(self, options, taxes):
-        #compute the tax amount
-        sql = self._sql_from_amls_one()
-        tables, where_clause, where_params = self.env['account.move.line']._query_get()
-        query = sql % (tables, where_clause)
-        self.env.cr.execute(query, where_params)
-        results = self.env.cr.fetchall()
-        for result in results:
-            if result[0] in taxes:
-                taxes[result[0]]['tax'] = abs(result[1])
+    def _compute_from_amls(self, date_ranges, tax_ids):
+        """ Returns a dictionary {(period index, tax_id): (tax, net)} of the
+            amounts of ``tax_ids`` over each of the ``date_ranges``, computed
+            in a single query.
+        """
+        if not tax_ids or not date_ranges:
+            return {}
+        tables, where_clause, where_params = self.env['account.move.line'].with_context(
+            date_from=min(date_range['date_from'] for date_range in date_ranges),
+            date_to=max(date_range['date_to'] for date_range in date_ranges),
+            strict_range=True)._query_get()
+        period_params = []
+        for index, date_range in enumerate(date_ranges):
+            period_params += [index, date_range['date_from'], date_range['date_to']]
+        query = self._sql_from_amls(tables, where_clause or 'TRUE', date_ranges)
+        self.env.cr.execute(query, tuple(period_params) + tuple(where_params) + (tuple(tax_ids),))
+        return dict(((period, tax_id), (abs(tax), abs(net)))
+                    for period, tax_id, tax, net in self.env.cr.fetchall())
 
-        #compute the net amount
-        sql2 = self._sql_from_amls_two()
-        query = sql2 % (tables, where_clause)
-        self.env.cr.execute(query, where_params)
-        results = self.env.cr.fetchall()
-        for result in results:
-            if result[0] in taxes:
-                taxes[result[0]]['net'] = abs(result[1])
+    def _get_tax_tree(self):
+        """ Returns the reported taxes of the allowed companies, as a list of
+            (tax_id, type_tax_use, tax_group_id) from the per company cache.
+        """
+        AccountTax = self.env['account.tax']
+        return [node for company in self.env.companies for node in AccountTax._get_tax_report_tree(company.id)]
 
     @api.model
     def get_lines(self, options):
-        taxes = {}
-        for tax in self.env['account.tax'].search([('type_tax_use', '!=', 'none')]):
-            if tax.children_tax_ids:
-                for child in tax.children_tax_ids:
-                    if child.type_tax_use != 'none':
-                        continue
-                    taxes[child.id] = {'tax': 0, 'net': 0, 'name': child.name, 'type': tax.type_tax_use}
-            else:
-                taxes[tax.id] = {'tax': 0, 'net': 0, 'name': tax.name, 'type': tax.type_tax_use}
-        self.with_context(date_from=options['date_from'], date_to=options['date_to'],
-                          state=options['target_move'],
-                          strict_range=True)._compute_from_amls(options, taxes)
+        date_ranges = self._get_date_ranges(options)
+        tree = self._get_tax_tree()
+        amounts = self.with_context(state=options['target_move'])._compute_from_amls(
+            date_ranges, [tax_id for tax_id, tax_type, group_id in tree])
+        taxes = self.env['account.tax'].browse([tax_id for tax_id, tax_type, group_id in tree])
+        names = dict((tax.id, tax.name) for tax in taxes)
+        tax_groups = taxes.tax_group_id
+        group_names = dict((group.id, group.name) for group in tax_groups)
+        group_rank = dict((group.id, rank) for rank, group in enumerate(tax_groups.sorted(
+            lambda group: (group.sequence, group.name or '', group.id))))
         groups = dict((tp, []) for tp in ['sale', 'purchase'])
-        for tax in taxes.values():
-            if tax['tax']:
-                groups[tax['type']].append(tax)
+        for tax_id, tax_type, group_id in tree:
+            periods = [dict(zip(('tax', 'net'), amounts.get((index, tax_id), (0.0, 0.0))))
+                       for index in range(len(date_ranges))]
+            if not any(period['tax'] for period in periods):
+                continue
+            groups[tax_type].append({
+                'name': names[tax_id],
+                'group': group_names.get(group_id, ''),
+                'group_id': group_id,
+                'tax': periods[0]['tax'],
+                'net': periods[0]['net'],
+                'periods': periods,
+            })
+        for tax_type in groups:
+            # stable sort: the taxes keep their order inside a tax group
+            groups[tax_type].sort(key=lambda line: group_rank.get(line['group_id'], -1))
         return groups
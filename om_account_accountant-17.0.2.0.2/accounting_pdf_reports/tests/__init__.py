@@ -0,0 +1,2 @@
+from . import test_account_balance_snapshot
+from . import test_report_aged_partner
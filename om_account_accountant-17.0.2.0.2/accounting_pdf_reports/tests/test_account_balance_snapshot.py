@@ -0,0 +1,138 @@
+from odoo import Command
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+
+
+@tagged('post_install', '-at_install')
+class TestAccountBalanceSnapshot(AccountTestInvoicingCommon):
+    """ The balances read from the snapshots must match the aggregation of
+        the journal items selected by ``_query_get``.
+    """
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.misc_journal = cls.company_data['default_journal_misc']
+        cls.other_journal = cls.misc_journal.copy({'name': 'Other Miscellaneous', 'code': 'OMISC'})
+        cls.revenue_account = cls.company_data['default_account_revenue']
+        cls.expense_account = cls.company_data['default_account_expense']
+        cls.receivable_account = cls.company_data['default_account_receivable']
+        cls.accounts = cls.revenue_account | cls.expense_account | cls.receivable_account
+
+        cls.moves = cls.env['account.move']
+        for date, journal, amount, post in [
+            ('2023-11-15', cls.misc_journal, 100.0, True),
+            ('2024-01-10', cls.misc_journal, 200.0, True),
+            ('2024-01-10', cls.misc_journal, 50.0, True),
+            ('2024-02-20', cls.other_journal, 300.0, True),
+            ('2024-02-20', cls.misc_journal, 400.0, False),
+            ('2024-03-05', cls.other_journal, 500.0, False),
+        ]:
+            move = cls._create_entry(date, journal, amount)
+            if post:
+                move.action_post()
+            cls.moves |= move
+
+    @classmethod
+    def _create_entry(cls, date, journal, amount):
+        return cls.env['account.move'].create({
+            'move_type': 'entry',
+            'date': date,
+            'journal_id': journal.id,
+            'line_ids': [
+                Command.create({'account_id': cls.receivable_account.id, 'partner_id': cls.partner_a.id,
+                                'debit': amount, 'credit': 0.0}),
+                Command.create({'account_id': cls.revenue_account.id, 'debit': 0.0, 'credit': amount * 0.75}),
+                Command.create({'account_id': cls.expense_account.id, 'debit': 0.0, 'credit': amount * 0.25}),
+            ],
+        })
+
+    def assertSnapshotBalances(self, **context):
+        Snapshot = self.env['account.balance.snapshot'].with_context(context)
+        balances = Snapshot._get_account_balances(self.accounts.ids)
+        self.assertIsNotNone(balances, "The snapshots should answer the context %s" % context)
+        expected = Snapshot._get_move_line_balances(self.accounts.ids)
+        # the accounts without journal items must not show up with zero balances
+        self.assertEqual(set(balances), set(expected), "accounts with the context %s" % context)
+        for account in self.accounts:
+            empty = {'debit': 0.0, 'credit': 0.0, 'balance': 0.0}
+            for field in ('debit', 'credit', 'balance'):
+                self.assertAlmostEqual(
+                    balances.get(account.id, empty)[field], expected.get(account.id, empty)[field],
+                    msg="%s of %s with the context %s" % (field, account.code, context))
+
+    def test_snapshot_filters(self):
+        self.assertSnapshotBalances(state='posted')
+        self.assertSnapshotBalances(state='all')
+        self.assertSnapshotBalances(state='posted', journal_ids=self.other_journal.ids)
+        self.assertSnapshotBalances(state='all', journal_ids=self.misc_journal.ids)
+        self.assertSnapshotBalances(state='posted', date_from='2024-01-01', date_to='2024-01-31', strict_range=True)
+        self.assertSnapshotBalances(state='all', date_from='2024-02-01', date_to='2024-03-31', strict_range=True)
+        self.assertSnapshotBalances(state='posted', date_from='2024-01-01', strict_range=True, initial_bal=True)
+        self.assertSnapshotBalances(state='all', date_from='2024-02-01', date_to='2024-12-31', strict_range=False)
+
+    def test_snapshot_follows_posting(self):
+        # posted on the same account, journal and date as existing snapshots
+        self._create_entry('2024-01-10', self.misc_journal, 75.0).action_post()
+        self.assertSnapshotBalances(state='posted')
+        # reset to draft, changed, then posted again
+        move = self.moves[1]
+        move.button_draft()
+        self.assertSnapshotBalances(state='posted')
+        move.write({'date': '2024-01-12'})
+        move.line_ids.filtered(lambda line: line.account_id == self.receivable_account).with_context(
+            check_move_validity=False).debit = 260.0
+        move.line_ids.filtered(lambda line: line.account_id == self.revenue_account).with_context(
+            check_move_validity=False).credit = 210.0
+        move.action_post()
+        self.assertSnapshotBalances(state='posted')
+        self.assertSnapshotBalances(state='posted', date_from='2024-01-11', date_to='2024-01-31', strict_range=True)
+        self.moves[4].action_post()
+        self.assertSnapshotBalances(state='all')
+        self.assertSnapshotBalances(state='posted', journal_ids=self.misc_journal.ids)
+
+    def test_snapshot_reset_to_draft(self):
+        # the only posted entry of the other journal
+        self.moves[3].button_draft()
+        self.assertSnapshotBalances(state='posted', journal_ids=self.other_journal.ids)
+        self.assertFalse(self.env['account.balance.snapshot'].search([('journal_id', '=', self.other_journal.id)]))
+
+    def test_snapshot_lines_of_posted_entry(self):
+        move = self.moves[0]
+        lines = self.env['account.move.line'].with_context(check_move_validity=False).create([
+            {'move_id': move.id, 'account_id': self.expense_account.id, 'debit': 30.0, 'credit': 0.0},
+            {'move_id': move.id, 'account_id': self.revenue_account.id, 'debit': 0.0, 'credit': 30.0},
+        ])
+        self.assertSnapshotBalances(state='posted')
+        lines.with_context(check_move_validity=False).unlink()
+        self.assertSnapshotBalances(state='posted')
+
+    def test_snapshot_rebuild(self):
+        Snapshot = self.env['account.balance.snapshot']
+        before = Snapshot._get_account_balances(self.accounts.ids)
+        Snapshot._rebuild()
+        self.assertEqual(Snapshot._get_account_balances(self.accounts.ids), before)
+
+    def test_restricting_rules(self):
+        user = self.env['res.users'].create({
+            'name': 'Snapshot Accountant',
+            'login': 'snapshot_accountant',
+            'groups_id': [Command.set(self.env.ref('account.group_account_user').ids)],
+            'company_id': self.env.company.id,
+            'company_ids': [Command.set(self.env.company.ids)],
+        })
+        Snapshot = self.env['account.balance.snapshot'].with_user(user).with_context(state='posted')
+        self.assertFalse(Snapshot._has_restricting_rules())
+        self.assertIsNotNone(Snapshot._get_account_balances(self.accounts.ids))
+
+        self.env['ir.rule'].create({
+            'name': 'Only the miscellaneous journal',
+            'model_id': self.env.ref('account.model_account_move_line').id,
+            'domain_force': "[('journal_id', '=', %s)]" % self.misc_journal.id,
+        })
+        self.assertTrue(Snapshot._has_restricting_rules())
+        self.assertIsNone(Snapshot._get_account_balances(self.accounts.ids))
+        # the fallback applies the rule
+        balances = Snapshot._compute_account_balances(self.accounts.ids)
+        self.assertEqual(balances, self.env['account.balance.snapshot'].with_context(
+            state='posted', journal_ids=self.misc_journal.ids)._get_move_line_balances(self.accounts.ids))
@@ -0,0 +1,82 @@
+from odoo import Command
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+
+
+@tagged('post_install', '-at_install')
+class TestReportAgedPartner(AccountTestInvoicingCommon):
+    """ Residual amounts and aging buckets of the aged partner balance,
+        computed in one statement.
+    """
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.report = cls.env['report.accounting_pdf_reports.report_agedpartnerbalance']
+        cls.receivable_account = cls.company_data['default_account_receivable']
+        cls.revenue_account = cls.company_data['default_account_revenue']
+        cls.bank_account = cls.company_data['default_journal_bank'].default_account_id
+
+    def _create_entry(self, date, amount, date_maturity=None, counterpart=None):
+        move = self.env['account.move'].create({
+            'move_type': 'entry',
+            'date': date,
+            'journal_id': self.company_data['default_journal_misc'].id,
+            'line_ids': [
+                Command.create({'account_id': self.receivable_account.id, 'partner_id': self.partner_a.id,
+                                'debit': max(amount, 0.0), 'credit': max(-amount, 0.0),
+                                'date_maturity': date_maturity or date}),
+                Command.create({'account_id': (counterpart or self.revenue_account).id,
+                                'debit': max(-amount, 0.0), 'credit': max(amount, 0.0)}),
+            ],
+        })
+        move.action_post()
+        return move.line_ids.filtered(lambda line: line.account_id == self.receivable_account)
+
+    def test_aged_buckets(self):
+        # not due as of the report date
+        self._create_entry('2024-06-15', 1000.0, date_maturity='2024-07-15')
+        # 1-30 days overdue, paid after the report date
+        late_paid = self._create_entry('2024-05-01', 500.0, date_maturity='2024-06-10')
+        (late_paid | self._create_entry('2024-07-10', -500.0, counterpart=self.bank_account)).reconcile()
+        # more than 120 days overdue, partially paid before the report date
+        partial = self._create_entry('2023-12-01', 300.0, date_maturity='2024-01-01')
+        (partial | self._create_entry('2024-06-01', -200.0, counterpart=self.bank_account)).reconcile()
+
+        partner_lines, total, lines = self.report._get_partner_move_lines(
+            ['asset_receivable'], [self.partner_a.id], '2024-06-30', 'posted', 30)
+        self.assertEqual(len(partner_lines), 1)
+        values = partner_lines[0]
+        self.assertEqual(values['partner_id'], self.partner_a.id)
+        self.assertAlmostEqual(values['direction'], 1000.0)
+        self.assertAlmostEqual(values['4'], 500.0)
+        for period in ('3', '2', '1'):
+            self.assertAlmostEqual(values[period], 0.0)
+        self.assertAlmostEqual(values['0'], 100.0)
+        self.assertAlmostEqual(values['total'], 1600.0)
+        self.assertAlmostEqual(total[6], 1000.0)
+        self.assertAlmostEqual(total[5], 1600.0)
+
+        # the details of the partner are loaded on access
+        details = lines[self.partner_a.id]
+        self.assertEqual(sorted((line['period'], line['amount']) for line in details),
+                         [(1, 100.0), (5, 500.0), (6, 1000.0)])
+
+    def test_aged_draft_entries(self):
+        move = self.env['account.move'].create({
+            'move_type': 'entry',
+            'date': '2024-06-01',
+            'journal_id': self.company_data['default_journal_misc'].id,
+            'line_ids': [
+                Command.create({'account_id': self.receivable_account.id, 'partner_id': self.partner_a.id,
+                                'debit': 250.0, 'date_maturity': '2024-06-20'}),
+                Command.create({'account_id': self.revenue_account.id, 'credit': 250.0}),
+            ],
+        })
+        posted, dummy, dummy = self.report._get_partner_move_lines(
+            ['asset_receivable'], [self.partner_a.id], '2024-06-30', 'posted', 30)
+        self.assertFalse(posted)
+        all_entries, dummy, dummy = self.report._get_partner_move_lines(
+            ['asset_receivable'], [self.partner_a.id], '2024-06-30', 'all', 30)
+        self.assertAlmostEqual(all_entries[0]['4'], 250.0)
+        self.assertEqual(move.state, 'draft')
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+""" Benchmark of the accounting reports.
+
+Seeds a database having ``accounting_pdf_reports`` installed with a synthetic
+ledger (companies with a chart of accounts, partners, invoices with taxes,
+payments reconciled with them, miscellaneous entries, foreign currencies),
+then times the ``_get_report_values`` of the reports. The wall time, the
+number of SQL statements and the peak of the memory allocated by each report
+(measured with ``tracemalloc`` in a separate run, as tracing slows the report
+down) are appended to a JSON history, so that runs can be compared::
+
+    python3 report_benchmark.py -c odoo.conf -d bench --seed --lines 1000000
+    python3 report_benchmark.py -c odoo.conf -d bench --history benchmark.json
+
+The data is generated from ``--random-seed``: two databases seeded with the
+same arguments hold the same ledger. The script must run with the Odoo server
+sources in the python path.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from psycopg2.extras import execute_values
+
+import odoo
+from odoo.tools import date_utils
+
+_logger = logging.getLogger('report_benchmark')
+
+COMPANY_NAME = 'Benchmark Company %s'
+PARTNER_NAME = 'Benchmark Partner %s'
+MOVE_PREFIX = 'BENCH/'
+# moves inserted per statement
+CHUNK_SIZE = 5000
+
+# report name: (wizard model, wizard values)
+REPORTS = {
+    'general_ledger': ('account.report.general.ledger', {
+        'initial_balance': True, 'sortby': 'sort_date', 'display_account': 'movement'}),
+    'trial_balance': ('account.balance.report', {'display_account': 'movement'}),
+    'partner_ledger': ('account.report.partner.ledger', {
+        'result_selection': 'customer_supplier', 'reconciled': True}),
+    'aged_balance': ('account.aged.trial.balance', {
+        'result_selection': 'customer_supplier', 'period_length': 30}),
+    'financial_report': ('accounting.report', {}),
+    'journal_audit': ('account.print.journal', {'sort_selection': 'move_name'}),
+    'tax_report': ('account.tax.report.wizard', {}),
+}
+
+MOVE_COLUMNS = ['name', 'journal_id', 'company_id', 'currency_id', 'partner_id', 'date',
+                'state', 'move_type', 'auto_post', 'create_uid', 'write_uid', 'create_date', 'write_date']
+LINE_COLUMNS = ['move_id', 'move_name', 'journal_id', 'company_id', 'company_currency_id', 'currency_id',
+                'account_id', 'partner_id', 'date', 'name', 'display_type', 'parent_state',
+                'debit', 'credit', 'balance', 'amount_currency', 'amount_residual',
+                'amount_residual_currency', 'reconciled', 'tax_line_id',
+                'create_uid', 'write_uid', 'create_date', 'write_date']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-c', '--config', help="Odoo configuration file")
+    parser.add_argument('-d', '--database', required=True)
+    parser.add_argument('--seed', action='store_true', help="seed the synthetic ledger before the benchmark")
+    parser.add_argument('--no-run', action='store_true', help="only seed the database")
+    parser.add_argument('--companies', type=int, default=1)
+    parser.add_argument('--partners', type=int, default=2000)
+    parser.add_argument('--lines', type=int, default=100000, help="number of move lines per company")
+    parser.add_argument('--year', type=int, default=date.today().year - 1, help="year of the entries")
+    parser.add_argument('--reconcile-ratio', type=float, default=0.7, help="share of the invoices paid")
+    parser.add_argument('--foreign-ratio', type=float, default=0.2, help="share of the invoices in foreign currency")
+    parser.add_argument('--random-seed', type=int, default=42)
+    parser.add_argument('--reports', nargs='+', choices=sorted(REPORTS), default=sorted(REPORTS))
+    parser.add_argument('--repeat', type=int, default=1, help="runs of each report, the best one is kept")
+    parser.add_argument('--history', default='report_benchmark.json', help="JSON history the results are appended to")
+    return parser.parse_args()
+
+
+# ---------------------------------------------------------------------------
+# Seeding
+# ---------------------------------------------------------------------------
+
+def seed_currencies(env):
+    """ Activates the foreign currencies of the multi-currency invoices """
+    currencies = env.ref('base.EUR') | env.ref('base.GBP')
+    currencies.active = True
+    return currencies
+
+
+def seed_company(env, index, args):
+    company = env['res.company'].create({
+        'name': COMPANY_NAME % index,
+        'currency_id': env.ref('base.USD').id,
+    })
+    env.user.company_ids |= company
+    env['account.chart.template'].try_loading('generic_coa', company, install_demo=False)
+    return company
+
+
+def seed_partners(env, args):
+    partners = env['res.partner']
+    for start in range(0, args.partners, CHUNK_SIZE):
+        partners |= partners.create([
+            {'name': PARTNER_NAME % i, 'customer_rank': 1, 'supplier_rank': 1}
+            for i in range(start, min(start + CHUNK_SIZE, args.partners))
+        ])
+    return partners
+
+
+def get_company_accounts(env, company):
+    """ Returns the journals, accounts and tax used to generate the entries """
+    Account = env['account.account'].with_company(company)
+    Journal = env['account.journal'].with_company(company)
+    tax = company.account_sale_tax_id
+    tax_line = tax.invoice_repartition_line_ids.filtered(lambda line: line.repartition_type == 'tax')[:1]
+    bank_journal = Journal.search([('company_id', '=', company.id), ('type', '=', 'bank')], limit=1)
+    return {
+        'sale_journal': Journal.search([('company_id', '=', company.id), ('type', '=', 'sale')], limit=1).id,
+        'bank_journal': bank_journal.id,
+        'misc_journal': Journal.search([('company_id', '=', company.id), ('type', '=', 'general')], limit=1).id,
+        'receivable': Account.search([('company_id', '=', company.id), ('account_type', '=', 'asset_receivable')], limit=1).id,
+        'bank': bank_journal.default_account_id.id,
+        'income': Account.search([('company_id', '=', company.id), ('account_type', '=', 'income')]).ids,
+        'misc': Account.search([('company_id', '=', company.id), ('account_type', 'not in', (
+            'asset_receivable', 'liability_payable', 'off_balance'))]).ids,
+        'tax': tax.id,
+        'tax_account': tax_line.account_id.id,
+        'tax_rate': tax.amount / 100.0,
+    }
+
+
+def seed_ledger(env, company, partners, currencies, args, rng):
+    """ Inserts the entries of the company in SQL: invoices (receivable,
+        income with its tax, tax line), payments reconciled with a share of
+        the invoices, and two-line miscellaneous entries for the remaining
+        lines.
+    """
+    cr = env.cr
+    accounts = get_company_accounts(env, company)
+    rates = dict((currency.id, rng.uniform(0.5, 1.5)) for currency in currencies)
+    # the reports converting amounts read the rates of the company
+    env['res.currency.rate'].create([{
+        'name': date(args.year, 1, 1),
+        'currency_id': currency_id,
+        'company_id': company.id,
+        'rate': rate,
+    } for currency_id, rate in rates.items()])
+    partner_ids = partners.ids
+    uid = env.uid
+    now = odoo.fields.Datetime.now()
+    year_start = date(args.year, 1, 1)
+    invoice_count = int(args.lines * 0.4 / (3 + 2 * args.reconcile_ratio))
+    misc_count = max(0, int(args.lines - invoice_count * (3 + 2 * args.reconcile_ratio)) // 2)
+    counters = {'move': 0}
+
+    def move_name(journal):
+        counters['move'] += 1
+        return '%s%s/%s/%06d' % (MOVE_PREFIX, journal, company.id, counters['move'])
+
+    def make_line(move, account_id, balance, currency_id=None, amount_currency=None, tax_line_id=None):
+        currency_id = currency_id or company.currency_id.id
+        amount_currency = balance if amount_currency is None else amount_currency
+        return [None, move['name'], move['journal_id'], company.id, company.currency_id.id, currency_id,
+                account_id, move['partner_id'], move['date'], move['name'], 'product', 'posted',
+                max(balance, 0.0), max(-balance, 0.0), balance, amount_currency, balance,
+                amount_currency, False, tax_line_id, uid, uid, now, now]
+
+    def flush(moves, lines, tax_rels, reconciles):
+        """ Inserts a chunk; lines, tax relations and reconciliations refer to
+            the index of their move and line in the chunk.
+        """
+        move_ids = [row[0] for row in execute_values(cr, """
+            INSERT INTO account_move (%s) VALUES %%s RETURNING id""" % ', '.join(MOVE_COLUMNS),
+            [[move[column] for column in MOVE_COLUMNS] for move in moves], fetch=True, page_size=len(moves))]
+        for move_index, line in lines:
+            line[0] = move_ids[move_index]
+        line_ids = [row[0] for row in execute_values(cr, """
+            INSERT INTO account_move_line (%s) VALUES %%s RETURNING id""" % ', '.join(LINE_COLUMNS),
+            [line for move_index, line in lines], fetch=True, page_size=len(lines))]
+        if tax_rels:
+            execute_values(cr, """
+                INSERT INTO account_move_line_account_tax_rel (account_move_line_id, account_tax_id) VALUES %s""",
+                [(line_ids[line_index], tax_id) for line_index, tax_id in tax_rels], page_size=len(tax_rels))
+        if reconciles:
+            execute_values(cr, """
+                INSERT INTO account_partial_reconcile (debit_move_id, credit_move_id, amount,
+                    debit_amount_currency, credit_amount_currency, debit_currency_id, credit_currency_id,
+                    company_id, max_date, create_uid, write_uid, create_date, write_date) VALUES %s""",
+                [(line_ids[debit], line_ids[credit], amount, amount_currency, amount_currency,
+                  currency_id, currency_id, company.id, max_date, uid, uid, now, now)
+                 for debit, credit, amount, amount_currency, currency_id, max_date in reconciles],
+                page_size=len(reconciles))
+            reconciled_ids = [line_ids[index] for reconcile in reconciles for index in reconcile[:2]]
+            cr.execute("""
+                UPDATE account_move_line
+                SET amount_residual = 0, amount_residual_currency = 0, reconciled = TRUE
+                WHERE id IN %s""", (tuple(reconciled_ids),))
+
+    def generate():
+        """ Yields the chunks of (moves, lines, tax relations, reconciliations) """
+        moves, lines, tax_rels, reconciles = [], [], [], []
+        for index in range(invoice_count + misc_count):
+            day = year_start + timedelta(days=rng.randrange(365))
+            partner_id = rng.choice(partner_ids) if partner_ids else None
+            if index < invoice_count:
+                amount = round(rng.uniform(10, 10000), 2)
+                tax_amount = round(amount * accounts['tax_rate'], 2)
+                currency_id, rate = company.currency_id.id, 1.0
+                if rates and rng.random() < args.foreign_ratio:
+                    currency_id = rng.choice(sorted(rates))
+                    rate = rates[currency_id]
+                invoice = {
+                    'name': move_name('INV'), 'journal_id': accounts['sale_journal'], 'company_id': company.id,
+                    'currency_id': currency_id, 'partner_id': partner_id, 'date': day, 'state': 'posted',
+                    'move_type': 'out_invoice', 'auto_post': 'no',
+                    'create_uid': uid, 'write_uid': uid, 'create_date': now, 'write_date': now,
+                }
+                moves.append(invoice)
+                receivable_index = len(lines)
+                total = amount + tax_amount
+                lines.append((len(moves) - 1, make_line(invoice, accounts['receivable'], total,
+                                                        currency_id, round(total * rate, 2))))
+                tax_rels.append((len(lines), accounts['tax']))
+                lines.append((len(moves) - 1, make_line(invoice, rng.choice(accounts['income']), -amount,
+                                                        currency_id, round(-amount * rate, 2))))
+                lines.append((len(moves) - 1, make_line(invoice, accounts['tax_account'], -tax_amount,
+                                                        currency_id, round(-tax_amount * rate, 2),
+                                                        tax_line_id=accounts['tax'])))
+                if rng.random() < args.reconcile_ratio:
+                    payment = dict(invoice, name=move_name('BNK'), journal_id=accounts['bank_journal'],
+                                   move_type='entry', date=day + timedelta(days=rng.randrange(90)))
+                    moves.append(payment)
+                    lines.append((len(moves) - 1, make_line(payment, accounts['bank'], total,
+                                                            currency_id, round(total * rate, 2))))
+                    reconciles.append((receivable_index, len(lines), total, round(total * rate, 2),
+                                       currency_id, payment['date']))
+                    lines.append((len(moves) - 1, make_line(payment, accounts['receivable'], -total,
+                                                            currency_id, round(-total * rate, 2))))
+            else:
+                amount = round(rng.uniform(1, 5000), 2)
+                entry = {
+                    'name': move_name('MISC'), 'journal_id': accounts['misc_journal'], 'company_id': company.id,
+                    'currency_id': company.currency_id.id, 'partner_id': None, 'date': day, 'state': 'posted',
+                    'move_type': 'entry', 'auto_post': 'no',
+                    'create_uid': uid, 'write_uid': uid, 'create_date': now, 'write_date': now,
+                }
+                moves.append(entry)
+                debit_account, credit_account = rng.sample(accounts['misc'], 2)
+                lines.append((len(moves) - 1, make_line(entry, debit_account, amount)))
+                lines.append((len(moves) - 1, make_line(entry, credit_account, -amount)))
+            if len(moves) >= CHUNK_SIZE:
+                yield moves, lines, tax_rels, reconciles
+                moves, lines, tax_rels, reconciles = [], [], [], []
+        if moves:
+            yield moves, lines, tax_rels, reconciles
+
+    line_count = 0
+    for moves, lines, tax_rels, reconciles in generate():
+        flush(moves, lines, tax_rels, reconciles)
+        line_count += len(lines)
+        _logger.info("%s: %s move lines inserted", company.name, line_count)
+    return line_count
+
+
+def seed(env, args):
+    if env['res.company'].search_count([('name', '=', COMPANY_NAME % 0)]):
+        raise SystemExit("The database %s is already seeded." % args.database)
+    rng = random.Random(args.random_seed)
+    currencies = seed_currencies(env)
+    partners = seed_partners(env, args)
+    for index in range(args.companies):
+        company = seed_company(env, index, args)
+        env.flush_all()
+        seed_ledger(env, company, partners, currencies, args, rng)
+        env.cr.commit()
+    env.invalidate_all()
+    # the ledger is inserted in SQL, the snapshots read by the trial balance
+    # and the financial reports are built from it
+    env['account.balance.snapshot']._rebuild()
+    env.cr.commit()
+    env.cr.execute("ANALYZE account_move, account_move_line, account_partial_reconcile, account_balance_snapshot")
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def get_report_call(env, company, report, args):
+    """ Fills the wizard of the report as a user would and returns the report
+        model, the records, the data and the context of the report action.
+    """
+    wizard_model, values = REPORTS[report]
+    values = dict(values)
+    Wizard = env[wizard_model].with_company(company).with_context(allowed_company_ids=[company.id])
+    if 'date_from' in Wizard._fields:
+        values.update(date_from=date(args.year, 1, 1), date_to=date(args.year, 12, 31))
+    if report == 'aged_balance':
+        values.update(date_from=date(args.year, 12, 31), date_to=False)
+    if report == 'financial_report':
+        # the first root report, its default is only read from the menu
+        values['account_report_id'] = env['account.financial.report'].search(
+            [('parent_id', '=', False)], order='sequence, id', limit=1).id
+        if not values['account_report_id']:
+            raise SystemExit("No financial report to benchmark.")
+    wizard = Wizard.create(values)
+    context = dict(Wizard.env.context, active_model=wizard._name, active_id=wizard.id, active_ids=wizard.ids)
+    action = wizard.with_context(context).check_report()
+    # the data goes through JSON as when the report is printed from the client
+    data = json.loads(json.dumps(action.get('data'), default=date_utils.json_default))
+    context.update(action.get('context') or {})
+    docids = context.get('active_ids') or wizard.ids
+    return env['report.%s' % action['report_name']].with_context(context), docids, data
+
+
+def run_report(env, company, report, args, trace_memory=False):
+    report_model, docids, data = get_report_call(env, company, report, args)
+    cr = env.cr
+    env.invalidate_all()
+    queries = cr.sql_log_count
+    if trace_memory:
+        # the peak of this report only, not of the whole process
+        tracemalloc.start()
+    start = time.perf_counter()
+    values = report_model._get_report_values(docids, data=data)
+    # consume the lazy values (streaming mode)
+    for value in values.values():
+        if hasattr(value, '__next__'):
+            for item in value:
+                for sub_value in (item.values() if isinstance(item, dict) else ()):
+                    if hasattr(sub_value, '__next__'):
+                        list(sub_value)
+    result = {
+        'wall_time': round(time.perf_counter() - start, 4),
+        'sql_count': cr.sql_log_count - queries,
+    }
+    if trace_memory:
+        result['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    return result
+
+
+def get_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(env, args):
+    companies = env['res.company'].search([('name', '=like', COMPANY_NAME % '%')], order='id')
+    if not companies:
+        raise SystemExit("The database %s is not seeded, run with --seed." % args.database)
+    env.cr.execute("SELECT COUNT(*) FROM account_move_line WHERE company_id = %s", (companies[0].id,))
+    line_count = env.cr.fetchone()[0]
+    results = {}
+    for report in args.reports:
+        runs = []
+        for i in range(args.repeat):
+            runs.append(run_report(env, companies[0], report, args))
+            # the wizards and reports must not leave anything behind
+            env.cr.rollback()
+        best = min(runs, key=lambda run: run['wall_time'])
+        best['peak_memory_kb'] = run_report(env, companies[0], report, args, trace_memory=True)['peak_memory_kb']
+        env.cr.rollback()
+        results[report] = best
+        _logger.info("%s: %.3fs, %s queries, peak memory %s kB",
+                     report, best['wall_time'], best['sql_count'], best['peak_memory_kb'])
+    return {
+        'date': odoo.fields.Datetime.to_string(odoo.fields.Datetime.now()),
+        'revision': get_revision(),
+        'database': args.database,
+        'move_lines': line_count,
+        'parameters': {
+            'companies': len(companies),
+            'year': args.year,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+
+
+def append_history(path, entry):
+    history = []
+    if os.path.exists(path):
+        with open(path) as f:
+            history = json.load(f)
+    previous = history[-1]['results'] if history else {}
+    for report, result in entry['results'].items():
+        if report in previous and previous[report]['wall_time']:
+            ratio = result['wall_time'] / previous[report]['wall_time']
+            result['wall_time_ratio'] = round(ratio, 3)
+            if ratio > 1.2:
+                _logger.warning("%s is %.0f%% slower than the previous run", report, (ratio - 1) * 100)
+    history.append(entry)
+    with open(path, 'w') as f:
+        json.dump(history, f, indent=2)
+
+
+def main():
+    args = parse_args()
+    odoo_args = ['-d', args.database]
+    if args.config:
+        odoo_args += ['-c', args.config]
+    odoo.tools.config.parse_config(odoo_args)
+    odoo.netsvc.init_logger()
+    registry = odoo.registry(args.database)
+    with registry.cursor() as cr:
+        env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+        if args.seed:
+            seed(env, args)
+            cr.commit()
+        if args.no_run:
+            return
+        entry = benchmark(env, args)
+    append_history(args.history, entry)
+
+
+if __name__ == '__main__':
+    main()
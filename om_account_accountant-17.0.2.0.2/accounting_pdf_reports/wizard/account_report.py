@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+# columns a multi-period report can be printed with
+MAX_PERIOD_COUNT = 36
 
 
 class AccountingReport(models.TransientModel):
@@ -21,8 +27,13 @@ class AccountingReport(models.TransientModel):
                                         required=True, default=_get_account_report)
     label_filter = fields.Char(string='Column Label', help="This label will be displayed on report to "
                                                            "show the balance computed for the given comparison filter.")
-    filter_cmp = fields.Selection([('filter_no', 'No Filters'), ('filter_date', 'Date')],
+    filter_cmp = fields.Selection([('filter_no', 'No Filters'), ('filter_date', 'Date'), ('filter_periods', 'Periods')],
                                   string='Filter by', required=True, default='filter_no')
+    period_count = fields.Integer(string='Number of Periods', default=12,
+                                  help="Number of periods ending with the end date. The periods "
+                                       "starting before the start date are left out.")
+    period_type = fields.Selection([('month', 'Months'), ('quarter', 'Quarters'), ('year', 'Years')],
+                                   string='Periods', required=True, default='month')
     date_from_cmp = fields.Date(string='Date From')
     date_to_cmp = fields.Date(string='Date To')
     debit_credit = fields.Boolean(string='Display Debit/Credit Columns',
@@ -41,17 +52,45 @@ class AccountingReport(models.TransientModel):
             result['strict_range'] = True
         return result
 
-    def check_report(self):
-        res = super(AccountingReport, self).check_report()
-        data = {}
-        data['form'] = self.read(['account_report_id', 'date_from_cmp', 'date_to_cmp', 'journal_ids', 'filter_cmp', 'target_move'])[0]
-        for field in ['account_report_id']:
-            if isinstance(data['form'][field], tuple):
-                data['form'][field] = data['form'][field][0]
-        comparison_context = self._build_comparison_context(data)
-        res['data']['form']['comparison_context'] = comparison_context
-        return res
+    def _get_periods(self):
+        """ Returns the consecutive periods, oldest first, of the columns of the
+            report. The last one ends on the end date, the first one starts at
+            the earliest on the start date.
+        """
+        if not 1 <= self.period_count <= MAX_PERIOD_COUNT:
+            raise UserError(_("The number of periods must be between 1 and %s.", MAX_PERIOD_COUNT))
+        months = {'month': 1, 'quarter': 3, 'year': 12}[self.period_type]
+        last_date = self.date_to or fields.Date.context_today(self)
+        if self.date_from and self.date_from > last_date:
+            raise UserError(_("The start date must be before the end date."))
+        # the periods are aligned on the months, the last one stops on the end date
+        date_to = last_date + relativedelta(day=31)
+        periods = []
+        for i in range(self.period_count):
+            if self.date_from and date_to < self.date_from:
+                break
+            date_from = date_to + relativedelta(days=1) - relativedelta(months=months)
+            if self.date_from:
+                date_from = max(date_from, self.date_from)
+            if months == 1:
+                name = date_from.strftime('%b %Y')
+            else:
+                name = '%s - %s' % (date_from.strftime('%b %Y'), date_to.strftime('%b %Y'))
+            periods.insert(0, {
+                'name': name,
+                'date_from': fields.Date.to_string(date_from),
+                'date_to': fields.Date.to_string(min(date_to, last_date)),
+            })
+            date_to = date_from - relativedelta(days=1)
+        return periods
 
     def _print_report(self, data):
         data['form'].update(self.read(['date_from_cmp', 'debit_credit', 'date_to_cmp', 'filter_cmp', 'account_report_id', 'enable_filter', 'label_filter', 'target_move'])[0])
+        for field in ['account_report_id']:
+            if isinstance(data['form'][field], tuple):
+                data['form'][field] = data['form'][field][0]
+        data['form']['comparison_context'] = self._build_comparison_context(data)
+        if self.enable_filter and self.filter_cmp == 'filter_periods':
+            data['form']['periods'] = self._get_periods()
+            data['form']['debit_credit'] = False
         return self.env.ref('accounting_pdf_reports.action_report_financial').report_action(self, data=data, config=False)
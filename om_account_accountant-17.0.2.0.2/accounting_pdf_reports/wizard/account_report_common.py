@@ -21,6 +21,11 @@ class AccountCommonReport(models.TransientModel):
     target_move = fields.Selection([('posted', 'All Posted Entries'),
                                     ('all', 'All Entries'),
                                     ], string='Target Moves', required=True, default='posted')
+    run_in_background = fields.Boolean(
+        string='Run in Background',
+        help='Render the report in a background job instead of waiting for it. '
+             'The result can be downloaded from Reporting > Report Jobs.'
+    )
 
     @api.onchange('company_id')
     def _onchange_company_id(self):
@@ -51,4 +56,4 @@ class AccountCommonReport(models.TransientModel):
         data['form'] = self.read(['date_from', 'date_to', 'journal_ids', 'target_move', 'company_id'])[0]
         used_context = self._build_contexts(data)
         data['form']['used_context'] = dict(used_context, lang=get_lang(self.env).code)
-        return self.with_context(discard_logo_check=True)._print_report(data)
+        return self.with_context(discard_logo_check=True, report_in_background=self.run_in_background)._print_report(data)
@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, api, fields
-from datetime import date
+from odoo import models, api, fields, _
+from odoo.exceptions import UserError
+from odoo.tools.misc import format_date
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
 
 
 class AccountTaxReport(models.TransientModel):
@@ -13,6 +16,41 @@ class AccountTaxReport(models.TransientModel):
                             default=lambda self: fields.Date.to_string(date.today().replace(day=1)))
     date_to = fields.Date(string='Date To', required=True,
                           default=lambda self: fields.Date.to_string(date.today()))
+    previous_periods = fields.Integer(string='Previous Periods', default=0,
+                                      help='Number of preceding periods of the same length printed next to '
+                                           'the selected one, all computed in the same run.')
+
+    def _get_date_ranges(self):
+        """ Returns the selected date range followed by the ``previous_periods``
+            preceding ones. Whole months are shifted by months, other ranges
+            by their number of days.
+        """
+        self.ensure_one()
+        if self.previous_periods < 0:
+            raise UserError(_('The number of previous periods cannot be negative.'))
+        if self.date_from > self.date_to:
+            raise UserError(_('The start date must precede the end date.'))
+        whole_months = self.date_from.day == 1 and (self.date_to + timedelta(days=1)).day == 1
+        if whole_months:
+            delta = relativedelta(self.date_to + timedelta(days=1), self.date_from)
+            months = delta.years * 12 + delta.months
+        days = (self.date_to - self.date_from).days + 1
+        date_ranges = []
+        for index in range(self.previous_periods + 1):
+            if whole_months:
+                date_from = self.date_from - relativedelta(months=months * index)
+                date_to = date_from + relativedelta(months=months) - timedelta(days=1)
+            else:
+                date_from = self.date_from - timedelta(days=days * index)
+                date_to = self.date_to - timedelta(days=days * index)
+            date_ranges.append({
+                'name': '%s - %s' % (format_date(self.env, date_from), format_date(self.env, date_to)),
+                'date_from': fields.Date.to_string(date_from),
+                'date_to': fields.Date.to_string(date_to),
+            })
+        return date_ranges
 
     def _print_report(self, data):
+        if self.previous_periods:
+            data['form']['date_ranges'] = self._get_date_ranges()
         return self.env.ref('accounting_pdf_reports.action_report_account_tax').report_action(self, data=data)
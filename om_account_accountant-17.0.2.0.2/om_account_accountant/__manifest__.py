@@ -26,6 +26,7 @@
         'om_recurring_payments',
         'om_account_daily_reports',
         'om_account_followup',
+        'om_account_currency',
     ],
     'data': [
         'security/group.xml',
@@ -5,7 +5,7 @@
     'name': 'Odoo 17 Assets Management',
     'version': '17.0.1.0.3',
     'author': 'Odoo Mates, Odoo SA',
-    'depends': ['account'],
+    'depends': ['account', 'om_account_currency'],
     'description': """Manage assets owned by a company or a person. 
         Keeps track of depreciation's, and creates corresponding journal entries""",
     'summary': 'Odoo 17 Assets Management',
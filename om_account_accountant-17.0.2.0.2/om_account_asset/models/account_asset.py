@@ -2,6 +2,8 @@
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
 import calendar
+import logging
+from collections import defaultdict
 from datetime import date, datetime
 from dateutil.relativedelta import relativedelta
 
@@ -9,6 +11,22 @@ from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
 from odoo.tools import float_compare, float_is_zero
 from markupsafe import Markup
+from psycopg2.extras import execute_values
+
+_logger = logging.getLogger(__name__)
+
+# depreciation lines inserted per statement
+INSERT_BATCH_SIZE = 5000
+# depreciation entries created, posted and committed together by the cron
+MOVE_BATCH_SIZE = 500
+# fields of the asset the depreciation board is computed from
+BOARD_FIELDS = ['value', 'salvage_value', 'currency_id', 'company_id', 'code', 'date',
+                'method', 'method_number', 'method_period', 'method_end', 'method_progress_factor',
+                'method_time', 'prorata', 'date_first_depreciation', 'first_depreciation_manual_date']
+# fields of the depreciation lines compared as amounts
+BOARD_AMOUNT_FIELDS = ['amount', 'remaining_value', 'depreciated_value']
+# share of changed unposted lines above which a board is recreated rather than updated
+BOARD_REWRITE_RATIO = 0.5
 
 
 class AccountAssetCategory(models.Model):
@@ -101,7 +119,7 @@ class AccountAssetAsset(models.Model):
     _description = 'Asset/Revenue Recognition'
     _inherit = ['mail.thread', 'mail.activity.mixin', 'analytic.mixin']
 
-    entry_count = fields.Integer(compute='_entry_count', string='# Asset Entries')
+    entry_count = fields.Integer(compute='_entry_count', string='# Asset Entries', store=True)
     name = fields.Char(string='Asset Name', required=True)
     code = fields.Char(string='Reference', size=32)
     value = fields.Monetary(string='Gross Value', required=True)
@@ -144,7 +162,7 @@ class AccountAssetAsset(models.Model):
     method_progress_factor = fields.Float(
         string='Degressive Factor', default=0.3
     )
-    value_residual = fields.Monetary(compute='_amount_residual', string='Residual Value')
+    value_residual = fields.Monetary(compute='_amount_residual', string='Residual Value', store=True)
     method_time = fields.Selection(
         [('number', 'Number of Entries'), ('end', 'Ending Date')],
         string='Time Method', required=True, default='number',
@@ -195,22 +213,61 @@ class AccountAssetAsset(models.Model):
 
     @api.model
     def _cron_generate_entries(self):
-        self.compute_generated_entries(datetime.today())
+        self.compute_generated_entries(datetime.today(), auto_commit=True)
 
     @api.model
-    def compute_generated_entries(self, date, asset_type=None):
-        # Entries generated : one by grouped category and one by asset from ungrouped category
-        created_move_ids = []
-        type_domain = []
+    def _get_due_depreciation_lines(self, date, asset_type=None):
+        """ Returns the unposted depreciation lines of the running assets due
+            at ``date``, selected in one query: the lines of the ungrouped
+            categories and those of the active grouped categories.
+        """
+        domain = [
+            ('asset_id.state', '=', 'open'),
+            ('depreciation_date', '<=', date),
+            ('move_id', '=', False),
+            '|', ('asset_id.category_id.group_entries', '=', False),
+                 ('asset_id.category_id.active', '=', True),
+        ]
         if asset_type:
-            type_domain = [('type', '=', asset_type)]
-
-        ungrouped_assets = self.env['account.asset.asset'].search(type_domain + [('state', '=', 'open'), ('category_id.group_entries', '=', False)])
-        created_move_ids += ungrouped_assets._compute_entries(date, group_entries=False)
+            domain.append(('asset_id.category_id.type', '=', asset_type))
+        return self.env['account.asset.depreciation.line'].search(domain, order='asset_id, depreciation_date, id')
 
-        for grouped_category in self.env['account.asset.category'].search(type_domain + [('group_entries', '=', True)]):
-            assets = self.env['account.asset.asset'].search([('state', '=', 'open'), ('category_id', '=', grouped_category.id)])
-            created_move_ids += assets._compute_entries(date, group_entries=True)
+    @api.model
+    def compute_generated_entries(self, date, asset_type=None, auto_commit=False):
+        """ Generates the entries of the depreciation lines due at ``date``:
+            one by grouped category and one by line of the ungrouped ones.
+            The moves of the ungrouped lines are created and posted by chunks
+            of MOVE_BATCH_SIZE, each grouped category in one go. With
+            ``auto_commit`` (cron), each chunk and each category is committed,
+            so that a run that is stopped resumes with the lines left without
+            entry.
+        """
+        created_move_ids = []
+        lines = self._get_due_depreciation_lines(date, asset_type=asset_type)
+        lines_by_category = {}
+        ungrouped_line_ids = []
+        for line in lines:
+            category = line.asset_id.category_id
+            if category.group_entries:
+                lines_by_category.setdefault(category, []).append(line.id)
+            else:
+                ungrouped_line_ids.append(line.id)
+        ungrouped_lines = lines.browse(ungrouped_line_ids)
+
+        for index in range(0, len(ungrouped_lines), MOVE_BATCH_SIZE):
+            created_move_ids += ungrouped_lines[index:index + MOVE_BATCH_SIZE].create_move()
+            if auto_commit:
+                self.env.cr.commit()
+                _logger.info("Asset entries: %s/%s depreciation lines processed",
+                             min(index + MOVE_BATCH_SIZE, len(ungrouped_lines)), len(ungrouped_lines))
+
+        # one entry per category: a category is done in one transaction
+        for index, (category, line_ids) in enumerate(lines_by_category.items(), 1):
+            created_move_ids += self.env['account.asset.depreciation.line'].browse(line_ids).create_grouped_move()
+            if auto_commit:
+                self.env.cr.commit()
+                _logger.info("Asset entries: %s/%s grouped categories processed (%s: %s depreciation lines)",
+                             index, len(lines_by_category), category.name, len(line_ids))
         return created_move_ids
 
     def _compute_board_amount(self, sequence, residual_amount, amount_to_depr,
@@ -260,76 +317,125 @@ class AccountAssetAsset(models.Model):
             undone_dotation_number += 1
         return undone_dotation_number
 
-    def compute_depreciation_board(self):
+    def _get_depreciation_schedule(self):
+        """ Returns the values of the unposted depreciation lines of the
+            asset, following its posted ones.
+        """
         self.ensure_one()
-
+        schedule = []
+        if self.value_residual == 0.0:
+            return schedule
         posted_depreciation_line_ids = self.depreciation_line_ids.filtered(lambda x: x.move_check).sorted(key=lambda l: l.depreciation_date)
-        unposted_depreciation_line_ids = self.depreciation_line_ids.filtered(lambda x: not x.move_check)
-
-        # Remove old unposted depreciation lines. We cannot use unlink() with One2many field
-        commands = [(2, line_id.id, False) for line_id in unposted_depreciation_line_ids]
-
-        if self.value_residual != 0.0:
-            amount_to_depr = residual_amount = self.value_residual
-
-            # if we already have some previous validated entries, starting date is last entry + method period
-            if posted_depreciation_line_ids and posted_depreciation_line_ids[-1].depreciation_date:
-                last_depreciation_date = fields.Date.from_string(posted_depreciation_line_ids[-1].depreciation_date)
-                depreciation_date = last_depreciation_date + relativedelta(months=+self.method_period)
-            else:
-                # depreciation_date computed from the purchase date
-                depreciation_date = self.date
-                if self.date_first_depreciation == 'last_day_period':
-                    # depreciation_date = the last day of the month
-                    depreciation_date = depreciation_date + relativedelta(day=31)
-                    # ... or fiscalyear depending the number of period
-                    if self.method_period == 12:
-                        depreciation_date = depreciation_date + relativedelta(month=int(self.company_id.fiscalyear_last_month))
-                        depreciation_date = depreciation_date + relativedelta(day=int(self.company_id.fiscalyear_last_day))
-                        if depreciation_date < self.date:
-                            depreciation_date = depreciation_date + relativedelta(years=1)
-                elif self.first_depreciation_manual_date and self.first_depreciation_manual_date != self.date:
-                    # depreciation_date set manually from the 'first_depreciation_manual_date' field
-                    depreciation_date = self.first_depreciation_manual_date
-            total_days = (depreciation_date.year % 4) and 365 or 366
-            month_day = depreciation_date.day
-            undone_dotation_number = self._compute_board_undone_dotation_nb(depreciation_date, total_days)
-
-            for x in range(len(posted_depreciation_line_ids), undone_dotation_number):
-                sequence = x + 1
-                amount = self._compute_board_amount(sequence, residual_amount, amount_to_depr,
-                                                    undone_dotation_number, posted_depreciation_line_ids,
-                                                    total_days, depreciation_date)
-                amount = self.currency_id.round(amount)
-                if float_is_zero(amount, precision_rounding=self.currency_id.rounding):
-                    continue
-                residual_amount -= amount
-                vals = {
-                    'amount': amount,
-                    'asset_id': self.id,
-                    'sequence': sequence,
-                    'name': (self.code or '') + '/' + str(sequence),
-                    'remaining_value': residual_amount,
-                    'depreciated_value': self.value - (self.salvage_value + residual_amount),
-                    'depreciation_date': depreciation_date,
-                }
-                commands.append((0, False, vals))
+        amount_to_depr = residual_amount = self.value_residual
 
-                depreciation_date = depreciation_date + relativedelta(months=+self.method_period)
-
-                if month_day > 28 and self.date_first_depreciation == 'manual':
-                    max_day_in_month = calendar.monthrange(depreciation_date.year, depreciation_date.month)[1]
-                    depreciation_date = depreciation_date.replace(day=min(max_day_in_month, month_day))
-
-                # datetime doesn't take into account that the number of days is not the same for each month
-                if not self.prorata and self.method_period % 12 != 0 and self.date_first_depreciation == 'last_day_period':
-                    max_day_in_month = calendar.monthrange(depreciation_date.year, depreciation_date.month)[1]
-                    depreciation_date = depreciation_date.replace(day=max_day_in_month)
-
-        self.write({'depreciation_line_ids': commands})
+        # if we already have some previous validated entries, starting date is last entry + method period
+        if posted_depreciation_line_ids and posted_depreciation_line_ids[-1].depreciation_date:
+            last_depreciation_date = fields.Date.from_string(posted_depreciation_line_ids[-1].depreciation_date)
+            depreciation_date = last_depreciation_date + relativedelta(months=+self.method_period)
+        else:
+            # depreciation_date computed from the purchase date
+            depreciation_date = self.date
+            if self.date_first_depreciation == 'last_day_period':
+                # depreciation_date = the last day of the month
+                depreciation_date = depreciation_date + relativedelta(day=31)
+                # ... or fiscalyear depending the number of period
+                if self.method_period == 12:
+                    depreciation_date = depreciation_date + relativedelta(month=int(self.company_id.fiscalyear_last_month))
+                    depreciation_date = depreciation_date + relativedelta(day=int(self.company_id.fiscalyear_last_day))
+                    if depreciation_date < self.date:
+                        depreciation_date = depreciation_date + relativedelta(years=1)
+            elif self.first_depreciation_manual_date and self.first_depreciation_manual_date != self.date:
+                # depreciation_date set manually from the 'first_depreciation_manual_date' field
+                depreciation_date = self.first_depreciation_manual_date
+        total_days = (depreciation_date.year % 4) and 365 or 366
+        month_day = depreciation_date.day
+        undone_dotation_number = self._compute_board_undone_dotation_nb(depreciation_date, total_days)
+        currency = self.currency_id
+        code = self.code or ''
+        depreciated_base = self.value - self.salvage_value
+        last_day_of_month = not self.prorata and self.method_period % 12 != 0 and self.date_first_depreciation == 'last_day_period'
+        keep_month_day = month_day > 28 and self.date_first_depreciation == 'manual'
+
+        for x in range(len(posted_depreciation_line_ids), undone_dotation_number):
+            sequence = x + 1
+            amount = self._compute_board_amount(sequence, residual_amount, amount_to_depr,
+                                                undone_dotation_number, posted_depreciation_line_ids,
+                                                total_days, depreciation_date)
+            amount = currency.round(amount)
+            if float_is_zero(amount, precision_rounding=currency.rounding):
+                continue
+            residual_amount -= amount
+            schedule.append({
+                'amount': amount,
+                'asset_id': self.id,
+                'sequence': sequence,
+                'name': code + '/' + str(sequence),
+                'remaining_value': residual_amount,
+                'depreciated_value': depreciated_base - residual_amount,
+                'depreciation_date': depreciation_date,
+            })
+
+            depreciation_date = depreciation_date + relativedelta(months=+self.method_period)
+
+            if keep_month_day:
+                max_day_in_month = calendar.monthrange(depreciation_date.year, depreciation_date.month)[1]
+                depreciation_date = depreciation_date.replace(day=min(max_day_in_month, month_day))
+
+            # datetime doesn't take into account that the number of days is not the same for each month
+            if last_day_of_month:
+                max_day_in_month = calendar.monthrange(depreciation_date.year, depreciation_date.month)[1]
+                depreciation_date = depreciation_date.replace(day=max_day_in_month)
+        return schedule
 
+    def compute_depreciation_board(self):
+        """ Recomputes the unposted depreciation lines of the assets, in batch """
+        self._compute_depreciation_boards()
         return True
 
+    def _compute_depreciation_boards(self):
+        """ Updates the unposted depreciation lines of the assets to their new
+            schedule: the schedules of all the assets are computed first, then
+            compared with the existing unposted lines, sequence by sequence.
+            The lines having the same changes are written together, the lines
+            in excess are removed at once, and the missing ones inserted with
+            one INSERT per batch, bypassing the One2many commands. When most
+            of the lines of an asset changed (e.g. a new value), its unposted
+            lines are removed and the whole schedule inserted instead.
+        """
+        if not self:
+            return
+        DepreciationLine = self.env['account.asset.depreciation.line']
+        # read the lines of all the assets at once
+        self.depreciation_line_ids.mapped('move_check')
+        to_insert = []
+        to_unlink = DepreciationLine
+        # {changes: lines}
+        to_write = defaultdict(lambda: DepreciationLine)
+        for asset in self:
+            schedule = asset._get_depreciation_schedule()
+            unposted_lines = asset.depreciation_line_ids.filtered(lambda x: not x.move_check).sorted(
+                key=lambda l: (l.sequence, l.id))
+            currency = asset.currency_id
+            changed_lines = []
+            for line, vals in zip(unposted_lines, schedule):
+                changes = dict((name, value) for name, value in vals.items() if name != 'asset_id' and (
+                    currency.compare_amounts(line[name], value) if name in BOARD_AMOUNT_FIELDS else line[name] != value))
+                if changes:
+                    changed_lines.append((line, changes))
+            if len(changed_lines) > BOARD_REWRITE_RATIO * max(len(unposted_lines), 1):
+                to_unlink |= unposted_lines
+                to_insert += schedule
+                continue
+            for line, changes in changed_lines:
+                to_write[tuple(sorted(changes.items()))] |= line
+            to_unlink |= unposted_lines[len(schedule):]
+            to_insert += schedule[len(unposted_lines):]
+        to_unlink.unlink()
+        for changes, lines in to_write.items():
+            lines.write(dict(changes))
+        DepreciationLine._insert_depreciation_lines(to_insert)
+        self.invalidate_recordset(['depreciation_line_ids'])
+
     def validate(self):
         self.write({'state': 'open'})
         fields = [
@@ -343,6 +449,9 @@ class AccountAssetAsset(models.Model):
             'invoice_id',
         ]
         ref_tracked_fields = self.env['account.asset.asset'].fields_get(fields)
+        author = self.env.user.partner_id
+        subtype_id = self.env['ir.model.data']._xmlid_to_res_id('mail.mt_note')
+        message_values = []
         for asset in self:
             tracked_fields = ref_tracked_fields.copy()
             if asset.method == 'linear':
@@ -352,7 +461,41 @@ class AccountAssetAsset(models.Model):
             else:
                 del(tracked_fields['method_number'])
             dummy, tracking_value_ids = asset._mail_track(tracked_fields, dict.fromkeys(fields))
-            asset.message_post(subject=_('Asset created'), tracking_value_ids=tracking_value_ids)
+            message_values.append({
+                'author_id': author.id,
+                'email_from': author.email_formatted,
+                'model': asset._name,
+                'res_id': asset.id,
+                'subject': _('Asset created'),
+                'body': '',
+                'message_type': 'notification',
+                'subtype_id': subtype_id,
+                'is_internal': True,
+                'tracking_value_ids': tracking_value_ids,
+            })
+        # the messages of all the assets are created at once
+        if message_values:
+            self.sudo()._message_create(message_values)
+
+    @api.model
+    def _create_notes(self, notes):
+        """ Logs the notes [(asset, body)] on the chatter of the assets with
+            one create, as ``message_post`` would do one by one.
+        """
+        if not notes:
+            return
+        author = self.env.user.partner_id
+        subtype_id = self.env['ir.model.data']._xmlid_to_res_id('mail.mt_note')
+        self.sudo()._message_create([{
+            'author_id': author.id,
+            'email_from': author.email_formatted,
+            'model': asset._name,
+            'res_id': asset.id,
+            'body': body,
+            'message_type': 'comment',
+            'subtype_id': subtype_id,
+            'is_internal': True,
+        } for asset, body in notes])
 
     def _return_disposal_view(self, move_ids):
         name = _('Disposal Move')
@@ -415,14 +558,34 @@ class AccountAssetAsset(models.Model):
     def set_to_draft(self):
         self.write({'state': 'draft'})
 
+    def _get_depreciation_totals(self):
+        """ Returns a dictionary {asset_id: (posted amount, entry count)} of
+            the depreciation lines of the assets, aggregated in one grouped
+            query. The records not saved yet are summed from the cache.
+        """
+        totals = {}
+        asset_ids = [asset.id for asset in self if asset.id]
+        if asset_ids:
+            self.env['account.asset.depreciation.line'].flush_model(['asset_id', 'amount', 'move_id', 'move_check'])
+            self.env.cr.execute("""
+                SELECT asset_id, COALESCE(SUM(amount) FILTER (WHERE move_check), 0), COUNT(move_id)
+                FROM account_asset_depreciation_line
+                WHERE asset_id IN %s
+                GROUP BY asset_id""", (tuple(asset_ids),))
+            totals = dict((asset_id, (amount, count)) for asset_id, amount, count in self.env.cr.fetchall())
+        for asset in self:
+            if not asset.id:
+                lines = asset.depreciation_line_ids
+                totals[asset.id] = (sum(lines.filtered('move_check').mapped('amount')),
+                                    len(lines.filtered('move_id')))
+        return totals
+
     @api.depends('value', 'salvage_value', 'depreciation_line_ids.move_check', 'depreciation_line_ids.amount')
     def _amount_residual(self):
+        totals = self._get_depreciation_totals()
         for rec in self:
-            total_amount = 0.0
-            for line in rec.depreciation_line_ids:
-                if line.move_check:
-                    total_amount += line.amount
-            rec.value_residual = rec.value - total_amount - rec.salvage_value
+            posted_amount = totals.get(rec.id, (0.0, 0))[0]
+            rec.value_residual = rec.value - posted_amount - rec.salvage_value
 
     @api.onchange('company_id')
     def onchange_company_id(self):
@@ -436,9 +599,9 @@ class AccountAssetAsset(models.Model):
 
     @api.depends('depreciation_line_ids.move_id')
     def _entry_count(self):
+        totals = self._get_depreciation_totals()
         for asset in self:
-            res = self.env['account.asset.depreciation.line'].search_count([('asset_id', '=', asset.id), ('move_id', '!=', False)])
-            asset.entry_count = res or 0
+            asset.entry_count = totals.get(asset.id, (0.0, 0))[1]
 
     @api.constrains('prorata', 'method_time')
     def _check_prorata(self):
@@ -493,15 +656,15 @@ class AccountAssetAsset(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         assets = super(AccountAssetAsset, self.with_context(mail_create_nolog=True)).create(vals_list)
-        for asset in assets:
-            asset.sudo().compute_depreciation_board()
+        assets.sudo()._compute_depreciation_boards()
         return assets
 
     def write(self, vals):
         res = super(AccountAssetAsset, self).write(vals)
-        if 'depreciation_line_ids' not in vals and 'state' not in vals:
-            for rec in self:
-                rec.compute_depreciation_board()
+        # only the fields of the schedule change the depreciation board
+        if 'depreciation_line_ids' not in vals and 'state' not in vals and any(
+                field in vals for field in BOARD_FIELDS):
+            self._compute_depreciation_boards()
         return res
 
     def open_entries(self):
@@ -547,6 +710,31 @@ class AccountAssetDepreciationLine(models.Model):
                                   related='asset_id.currency_id',
                                   readonly=True)
 
+    @api.model
+    def _insert_depreciation_lines(self, vals_list):
+        """ Inserts new (unposted) depreciation lines in SQL, one INSERT per
+            batch of INSERT_BATCH_SIZE lines, and returns their ids.
+        """
+        if not vals_list:
+            return []
+        self.flush_model()
+        line_ids = []
+        now = fields.Datetime.now()
+        for index in range(0, len(vals_list), INSERT_BATCH_SIZE):
+            batch = vals_list[index:index + INSERT_BATCH_SIZE]
+            query = """
+                INSERT INTO account_asset_depreciation_line
+                    (name, sequence, asset_id, amount, remaining_value, depreciated_value,
+                     depreciation_date, move_check, move_posted_check,
+                     create_uid, create_date, write_uid, write_date)
+                VALUES %s
+                RETURNING id"""
+            rows = [(vals['name'], vals['sequence'], vals['asset_id'], vals['amount'], vals['remaining_value'],
+                     vals['depreciated_value'], vals['depreciation_date'], False, False,
+                     self.env.uid, now, self.env.uid, now) for vals in batch]
+            line_ids += [row[0] for row in execute_values(self.env.cr, query, rows, page_size=len(rows), fetch=True)]
+        return line_ids
+
     @api.depends('move_id')
     def _get_move_check(self):
         for line in self:
@@ -558,28 +746,37 @@ class AccountAssetDepreciationLine(models.Model):
             line.move_posted_check = True if line.move_id and line.move_id.state == 'posted' else False
 
     def create_move(self, post_move=True):
-        created_moves = self.env['account.move']
+        if any(line.move_id for line in self):
+            raise UserError(_('This depreciation is already linked to a journal entry. Please post or delete it.'))
+        converter = self.env['res.currency']._get_converter()
+        # the rates of all the depreciation dates are read at once
+        for company in self.asset_id.company_id:
+            company_lines = self.filtered(lambda line: line.asset_id.company_id == company)
+            converter.prefetch(company_lines.asset_id.currency_id | company.currency_id, company, [
+                self.env.context.get('depreciation_date') or line.depreciation_date or fields.Date.context_today(self)
+                for line in company_lines])
+        vals_list = []
         for line in self:
-            if line.move_id:
-                raise UserError(_('This depreciation is already linked to a journal entry. Please post or delete it.'))
-            move_vals = self._prepare_move(line)
-            move = self.env['account.move'].create(move_vals)
-            line.write({'move_id': move.id, 'move_check': True})
-            created_moves |= move
+            move_vals = self._prepare_move(line, converter=converter)
+            # link the depreciation line with its move at creation
+            move_vals['asset_depreciation_ids'] = [(4, line.id)]
+            vals_list.append(move_vals)
+        created_moves = self.env['account.move'].create(vals_list)
 
         if post_move and created_moves:
             created_moves.filtered(lambda m: any(m.asset_depreciation_ids.mapped('asset_id.category_id.open_asset'))).action_post()
         return [x.id for x in created_moves]
 
-    def _prepare_move(self, line):
+    def _prepare_move(self, line, converter=None):
         category_id = line.asset_id.category_id
         analytic_distribution = line.asset_id.analytic_distribution
         depreciation_date = self.env.context.get('depreciation_date') or line.depreciation_date or fields.Date.context_today(self)
         company_currency = line.asset_id.company_id.currency_id
         current_currency = line.asset_id.currency_id
         prec = company_currency.decimal_places
-        amount = current_currency._convert(
-            line.amount, company_currency, line.asset_id.company_id, depreciation_date)
+        converter = converter or self.env['res.currency']._get_converter()
+        amount = converter.convert(
+            line.amount, current_currency, company_currency, line.asset_id.company_id, depreciation_date)
         asset_name = line.asset_id.name + ' (%s/%s)' % (line.sequence, len(line.asset_id.depreciation_line_ids))
         move_line_1 = {
             'name': asset_name,
@@ -618,12 +815,13 @@ class AccountAssetDepreciationLine(models.Model):
 
         depreciation_date = self.env.context.get('depreciation_date') or fields.Date.context_today(self)
         amount = 0.0
+        converter = self.env['res.currency']._get_converter()
         for line in self:
             # Sum amount of all depreciation lines
             company_currency = line.asset_id.company_id.currency_id
             current_currency = line.asset_id.currency_id
             company = line.asset_id.company_id
-            amount += current_currency._convert(line.amount, company_currency, company, fields.Date.today())
+            amount += converter.convert(line.amount, current_currency, company_currency, company, fields.Date.today())
 
         name = category_id.name + _(' (grouped)')
         move_line_1 = {
@@ -666,12 +864,11 @@ class AccountAssetDepreciationLine(models.Model):
 
     def post_lines_and_close_asset(self):
         # we re-evaluate the assets to determine whether we can close them
-        for line in self:
-            line.log_message_when_posted()
-            asset = line.asset_id
-            if asset.currency_id.is_zero(asset.value_residual):
-                asset.message_post(body=_("Document closed."))
-                asset.write({'state': 'close'})
+        self.log_message_when_posted()
+        assets = self.asset_id.filtered(lambda asset: asset.currency_id.is_zero(asset.value_residual))
+        if assets:
+            assets._create_notes([(asset, _("Document closed.")) for asset in assets])
+            assets.write({'state': 'close'})
 
     def log_message_when_posted(self):
         def _format_message(message_description, tracked_values):
@@ -683,6 +880,7 @@ class AccountAssetDepreciationLine(models.Model):
                 message += '%s</div>' % values
             return Markup(message)
 
+        notes = []
         for line in self:
             if line.move_id and line.move_id.state == 'draft':
                 partner_name = line.asset_id.partner_id.name
@@ -690,8 +888,9 @@ class AccountAssetDepreciationLine(models.Model):
                 msg_values = {_('Currency'): currency_name, _('Amount'): line.amount}
                 if partner_name:
                     msg_values[_('Partner')] = partner_name
-                msg = _format_message(_('Depreciation line posted.'), msg_values)
-                line.asset_id.message_post(body=msg)
+                notes.append((line.asset_id, _format_message(_('Depreciation line posted.'), msg_values)))
+        # the notes of all the lines are created at once
+        self.env['account.asset.asset']._create_notes(notes)
     
     def unlink(self):
         for record in self:
@@ -46,11 +46,10 @@ class AccountMove(models.Model):
 
     def action_post(self):
         result = super(AccountMove, self).action_post()
-        for inv in self:
-            context = dict(self.env.context)
-            context.pop('default_type', None)
-            for mv_line in inv.invoice_line_ids:
-                mv_line.with_context(context).asset_create()
+        context = dict(self.env.context)
+        context.pop('default_type', None)
+        # the assets of all the posted moves are created at once
+        self.invoice_line_ids.with_context(context)._create_assets()
         return result
 
 
@@ -103,34 +102,58 @@ class AccountMoveLine(models.Model):
                     rec.asset_start_date = start_date
                     rec.asset_end_date = end_date
 
-    def asset_create(self):
-        if self.asset_category_id:
-            price_subtotal = self.currency_id._convert(
-                self.price_subtotal,
-                self.company_currency_id,
-                self.company_id,
-                self.move_id.invoice_date or fields.Date.context_today(
-                    self))
-            vals = {
-                'name': self.name,
-                'code': self.name or False,
-                'category_id': self.asset_category_id.id,
-                'value': price_subtotal,
-                'partner_id': self.move_id.partner_id.id,
-                'company_id': self.move_id.company_id.id,
-                'currency_id': self.move_id.company_currency_id.id,
-                'date': self.move_id.invoice_date or self.move_id.date,
-                'invoice_id': self.move_id.id,
-            }
-            changed_vals = self.env['account.asset.asset'].onchange_category_id_values(vals['category_id'])
-            vals.update(changed_vals['value'])
-            asset = self.env['account.asset.asset'].create(vals)
-            if self.asset_category_id.open_asset:
-                if asset.date_first_depreciation == 'manual':
-                    asset.first_depreciation_manual_date = asset.date
-                asset.validate()
+    def asset_create(self, converter=None):
+        self._create_assets(converter=converter)
         return True
 
+    def _prepare_asset_vals(self, converter, category_values):
+        """ Returns the values of the asset of the line """
+        self.ensure_one()
+        move = self.move_id
+        price_subtotal = converter.convert(
+            self.price_subtotal,
+            self.currency_id,
+            self.company_currency_id,
+            self.company_id,
+            move.invoice_date or fields.Date.context_today(self))
+        vals = {
+            'name': self.name,
+            'code': self.name or False,
+            'category_id': self.asset_category_id.id,
+            'value': price_subtotal,
+            'partner_id': move.partner_id.id,
+            'company_id': move.company_id.id,
+            'currency_id': move.company_currency_id.id,
+            'date': move.invoice_date or move.date,
+            'invoice_id': move.id,
+        }
+        vals.update(category_values)
+        if self.asset_category_id.open_asset and vals['date_first_depreciation'] == 'manual':
+            vals['first_depreciation_manual_date'] = vals['date']
+        return vals
+
+    def _create_assets(self, converter=None):
+        """ Creates the assets of the lines having an asset category, with one
+            create for all of them: the categories and the currency rates are
+            read once, and the assets of the auto-confirmed categories are
+            validated together.
+        """
+        lines = self.filtered('asset_category_id')
+        if not lines:
+            return self.env['account.asset.asset']
+        converter = converter or self.env['res.currency']._get_converter()
+        Asset = self.env['account.asset.asset']
+        for company in lines.company_id:
+            company_lines = lines.filtered(lambda line: line.company_id == company)
+            converter.prefetch(company_lines.currency_id | company_lines.company_currency_id, company,
+                               [line.move_id.invoice_date or fields.Date.context_today(line) for line in company_lines])
+        category_values = dict((category.id, Asset.onchange_category_id_values(category.id)['value'])
+                               for category in lines.asset_category_id)
+        assets = Asset.create([line._prepare_asset_vals(converter, category_values[line.asset_category_id.id])
+                               for line in lines])
+        assets.filtered(lambda asset: asset.category_id.open_asset).validate()
+        return assets
+
     @api.onchange('asset_category_id', 'product_uom_id')
     def onchange_asset_category_id(self):
         if self.move_id.move_type == 'out_invoice' and self.asset_category_id:
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+{
+    'name': 'Odoo 17 Currency Converter',
+    'author': 'Odoo Mates, Odoo SA',
+    'category': 'Accounting',
+    'version': '17.0.1.0',
+    'description': """Cached currency conversions shared by the accounting reports and batch runs""",
+    'summary': 'Odoo 17 Cached Currency Converter',
+    'sequence': 10,
+    'website': 'https://www.odoomates.tech',
+    'depends': ['account'],
+    'license': 'LGPL-3',
+    'data': [],
+}
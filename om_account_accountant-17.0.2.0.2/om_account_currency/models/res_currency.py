@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from collections import OrderedDict
+from odoo import api, fields, models
+
+
+class CurrencyConverter(object):
+    """ Request-scoped currency converter for the report engines and the
+        batch runs.
+
+        Rates of the dates a run needs can be prefetched in one query with
+        :meth:`prefetch`; conversion rates are memoized in an LRU cache keyed
+        on (from currency, to currency, company, date). ``hits``, ``misses``
+        and ``queries`` count the cache usage for profiling.
+    """
+
+    def __init__(self, env, maxsize=4096):
+        self.env = env
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0
+        # {(currency_id, company_id, date): rate}
+        self._rates = {}
+        # LRU {(from_currency_id, to_currency_id, company_id, date): conversion rate}
+        self._conversion_rates = OrderedDict()
+
+    def prefetch(self, currencies, company, dates):
+        """ Loads the rates of ``currencies`` for all ``dates`` in one query """
+        dates = {fields.Date.to_date(date) for date in dates if date}
+        dates = [date for date in dates if any(
+            (currency.id, company.id, date) not in self._rates for currency in currencies)]
+        if not currencies or not dates:
+            return
+        self.env['res.currency.rate'].flush_model(['rate', 'name', 'currency_id', 'company_id'])
+        self.env.cr.execute("""
+            SELECT d.date, c.id, COALESCE(
+                (SELECT r.rate FROM res_currency_rate r
+                  WHERE r.currency_id = c.id AND r.name <= d.date
+                    AND (r.company_id IS NULL OR r.company_id = %(company_id)s)
+               ORDER BY r.company_id, r.name DESC LIMIT 1),
+                (SELECT r.rate FROM res_currency_rate r
+                  WHERE r.currency_id = c.id
+                    AND (r.company_id IS NULL OR r.company_id = %(company_id)s)
+               ORDER BY r.company_id, r.name ASC LIMIT 1),
+                1.0)
+            FROM unnest(%(dates)s::date[]) AS d(date), res_currency c
+            WHERE c.id IN %(currency_ids)s""", {
+            'company_id': company.root_id.id,
+            'dates': dates,
+            'currency_ids': tuple(currencies.ids),
+        })
+        self.queries += 1
+        for date, currency_id, rate in self.env.cr.fetchall():
+            self._rates[(currency_id, company.id, date)] = rate
+
+    def _get_rate(self, currency, company, date):
+        key = (currency.id, company.id, date)
+        if key not in self._rates:
+            self.prefetch(currency, company, [date])
+        return self._rates[key]
+
+    def get_conversion_rate(self, from_currency, to_currency, company, date):
+        if from_currency == to_currency:
+            return 1.0
+        date = fields.Date.to_date(date)
+        key = (from_currency.id, to_currency.id, company.id, date)
+        if key in self._conversion_rates:
+            self.hits += 1
+            self._conversion_rates.move_to_end(key)
+            return self._conversion_rates[key]
+        self.misses += 1
+        rate = self._get_rate(to_currency, company, date) / self._get_rate(from_currency, company, date)
+        self._conversion_rates[key] = rate
+        if len(self._conversion_rates) > self.maxsize:
+            self._conversion_rates.popitem(last=False)
+        return rate
+
+    def convert(self, amount, from_currency, to_currency, company, date, round=True):
+        """ Same as ``res.currency._convert`` but served from the cache """
+        if from_currency == to_currency:
+            to_amount = amount
+        else:
+            to_amount = amount * self.get_conversion_rate(from_currency, to_currency, company, date)
+        return to_currency.round(to_amount) if round else to_amount
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'queries': self.queries}
+
+
+class ResCurrency(models.Model):
+    _inherit = "res.currency"
+
+    @api.model
+    def _get_converter(self, maxsize=4096):
+        """ Returns a new :class:`CurrencyConverter`, meant to live as long as
+            one report or batch run.
+        """
+        return CurrencyConverter(self.env, maxsize=maxsize)
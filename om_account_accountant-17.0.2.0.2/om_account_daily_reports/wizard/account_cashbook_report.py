@@ -49,6 +49,11 @@ class AccountCashBookReport(models.TransientModel):
                                           ' display the amount of debit/credit/balance that precedes '
                                           'the filter you\'ve set.')
 
+    run_in_background = fields.Boolean(
+        string='Run in Background',
+        help='Render the report in a background job instead of waiting for it. '
+             'The result can be downloaded from Reporting > Report Jobs.')
+
     @api.onchange('account_ids')
     def onchange_account_ids(self):
         if self.account_ids:
@@ -78,6 +83,7 @@ class AccountCashBookReport(models.TransientModel):
         comparison_context = self._build_comparison_context(data)
         data['form']['comparison_context'] = comparison_context
         return self.env.ref(
-            'om_account_daily_reports.action_report_cash_book').report_action(self,
+            'om_account_daily_reports.action_report_cash_book').with_context(
+            report_in_background=self.run_in_background).report_action(self,
                                                                      data=data)
 
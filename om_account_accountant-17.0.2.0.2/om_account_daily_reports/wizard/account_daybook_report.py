@@ -18,6 +18,11 @@ class AccountDayBookReport(models.TransientModel):
     account_ids = fields.Many2many('account.account', 'account_account_daybook_report', 'report_line_id',
                                    'account_id', 'Accounts')
 
+    run_in_background = fields.Boolean(
+        string='Run in Background',
+        help='Render the report in a background job instead of waiting for it. '
+             'The result can be downloaded from Reporting > Report Jobs.')
+
     def _build_comparison_context(self, data):
         result = {}
         result['journal_ids'] = 'journal_ids' in data['form'] and data['form']['journal_ids'] or False
@@ -32,7 +37,8 @@ class AccountDayBookReport(models.TransientModel):
         comparison_context = self._build_comparison_context(data)
         data['form']['comparison_context'] = comparison_context
         return self.env.ref(
-            'om_account_daily_reports.action_report_day_book').report_action(self,
+            'om_account_daily_reports.action_report_day_book').with_context(
+            report_in_background=self.run_in_background).report_action(self,
                                                                      data=data)
 
 